@@ -0,0 +1,212 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import and_, delete, insert, or_
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.future import select
+
+from app.config import SettingsBound
+from app.db import async_session_maker
+from app.events import event_bus, project_event
+from app.models import (
+    ArchivedProject,
+    ArchivedTask,
+    Project,
+    ProjectMember,
+    ProjectProcessStatus,
+    ProjectTaskCount,
+    Task,
+)
+from app.response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+PROJECT_COLUMNS = [
+    "project_id", "project_name", "project_status", "project_priority", "owner_id",
+    "created_at", "updated_at", "deleted_at",
+]
+TASK_COLUMNS = ["task_id", "task_name", "project_id", "assignee_id", "created_at", "updated_at", "deleted_at"]
+
+
+def _copy_tasks(*conditions):
+    return insert(ArchivedTask).from_select(
+        TASK_COLUMNS, select(*(getattr(Task, name) for name in TASK_COLUMNS)).where(*conditions)
+    )
+
+
+# Moves soft-deleted rows and long-archived projects out of projects_info/tasks into
+# the archive tables, one bounded batch per transaction, so the hot tables and their
+# indexes only hold the live working set.
+class Archiver:
+    def __init__(
+        self,
+        session_maker: async_sessionmaker,
+        batch_size: int,
+        interval: float,
+        archive_after: timedelta,
+        retention: timedelta,
+    ):
+        self.session_maker = session_maker
+        self.batch_size = batch_size
+        self.interval = interval
+        self.archive_after = archive_after
+        self.retention = retention
+        self._task: Optional[asyncio.Task] = None
+        self.archived_projects = 0
+        self.archived_tasks = 0
+        self.purged_projects = 0
+        self.purged_tasks = 0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="archiver")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.archive()
+            except Exception:
+                logger.exception("Archival round failed")
+            await asyncio.sleep(self.interval)
+
+    async def archive(self) -> Dict[str, int]:
+        totals = {"projects": 0, "tasks": 0}
+        while True:
+            async with self.session_maker() as session:
+                now = datetime.now(timezone.utc)
+                # Deleted tasks first: that includes the tasks of deleted projects, so the
+                # project batches below rarely carry more than a few live tasks along.
+                tasks = await self._archive_deleted_tasks(session, now)
+                projects, project_task_ids = await self._archive_projects(session, now)
+                await session.commit()
+
+            response_cache.evict("project", *(row.project_id for row in projects))
+            response_cache.evict("task", *project_task_ids)
+            # Soft-deleted projects were announced when deleted; archived ones leave the feed now.
+            await event_bus.publish(*(
+                project_event("deleted", row.project_id) for row in projects if row.deleted_at is None
+            ))
+            totals["tasks"] += tasks + len(project_task_ids)
+            totals["projects"] += len(projects)
+            if tasks < self.batch_size and len(projects) < self.batch_size:
+                break
+            await asyncio.sleep(0)
+
+        self.archived_projects += totals["projects"]
+        self.archived_tasks += totals["tasks"]
+        if totals["projects"] or totals["tasks"]:
+            logger.info("Archived %s projects and %s tasks", totals["projects"], totals["tasks"])
+        return totals
+
+    async def _archive_deleted_tasks(self, session: AsyncSession, now: datetime) -> int:
+        result = await session.scalars(
+            select(Task.task_id)
+            .where(Task.deleted_at <= now - self.retention)
+            .order_by(Task.task_id)
+            .limit(self.batch_size)
+            # Several workers may run the archiver; each takes a disjoint batch.
+            .with_for_update(skip_locked=True)
+        )
+        task_ids = result.all()
+        if task_ids:
+            await session.execute(_copy_tasks(Task.task_id.in_(task_ids)))
+            await session.execute(delete(Task).where(Task.task_id.in_(task_ids)))
+        return len(task_ids)
+
+    async def _archive_projects(self, session: AsyncSession, now: datetime):
+        result = await session.execute(
+            select(Project.project_id, Project.deleted_at)
+            .where(
+                or_(
+                    Project.deleted_at <= now - self.retention,
+                    and_(
+                        Project.deleted_at.is_(None),
+                        Project.project_status == ProjectProcessStatus.ARCHIVED,
+                        Project.updated_at <= now - self.archive_after,
+                    ),
+                )
+            )
+            .order_by(Project.project_id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        rows = result.all()
+        if not rows:
+            return [], []
+
+        project_ids = [row.project_id for row in rows]
+        task_ids = await session.scalars(select(Task.task_id).where(Task.project_id.in_(project_ids)))
+        task_ids = task_ids.all()
+        if task_ids:
+            await session.execute(_copy_tasks(Task.project_id.in_(project_ids)))
+            await session.execute(delete(Task).where(Task.project_id.in_(project_ids)))
+        await session.execute(
+            insert(ArchivedProject).from_select(
+                PROJECT_COLUMNS,
+                select(*(getattr(Project, name) for name in PROJECT_COLUMNS)).where(
+                    Project.project_id.in_(project_ids)
+                ),
+            )
+        )
+        await session.execute(delete(ProjectTaskCount).where(ProjectTaskCount.project_id.in_(project_ids)))
+        await session.execute(delete(ProjectMember).where(ProjectMember.project_id.in_(project_ids)))
+        await session.execute(delete(Project).where(Project.project_id.in_(project_ids)))
+        return rows, task_ids
+
+    async def purge(self, before: datetime) -> Dict[str, int]:
+        # Permanently drops archived rows, one bounded batch per transaction.
+        totals = {}
+        for key, model, id_column in (
+            ("tasks", ArchivedTask, ArchivedTask.archive_id),
+            ("projects", ArchivedProject, ArchivedProject.archive_id),
+        ):
+            totals[key] = 0
+            while True:
+                async with self.session_maker() as session:
+                    batch = select(id_column).where(model.archived_at < before).limit(self.batch_size)
+                    result = await session.execute(
+                        delete(model)
+                        .where(id_column.in_(batch))
+                        .returning(id_column)
+                        .execution_options(synchronize_session=False)
+                    )
+                    purged = len(result.all())
+                    await session.commit()
+                totals[key] += purged
+                if purged < self.batch_size:
+                    break
+
+        self.purged_projects += totals["projects"]
+        self.purged_tasks += totals["tasks"]
+        logger.info("Purged %s archived projects and %s archived tasks", totals["projects"], totals["tasks"])
+        return totals
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "archived_projects": self.archived_projects,
+            "archived_tasks": self.archived_tasks,
+            "purged_projects": self.purged_projects,
+            "purged_tasks": self.purged_tasks,
+        }
+
+
+archiver = SettingsBound(
+    lambda config: Archiver(
+        async_session_maker,
+        batch_size=config.archive_batch_size,
+        interval=config.archive_interval_seconds,
+        archive_after=timedelta(days=config.archive_after_days),
+        retention=timedelta(days=config.soft_delete_retention_days),
+    )
+)
@@ -1,59 +1,130 @@
+import logging
+import time
 import uuid
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Any, Dict, Optional
 
-from fastapi import Depends, HTTPException, status, BackgroundTasks, Request
-from fastapi_users import BaseUserManager, FastAPIUsers, UUIDIDMixin
+from fastapi import Depends, HTTPException, status, Request
+from fastapi_users import BaseUserManager, FastAPIUsers, UUIDIDMixin, exceptions
 from fastapi_users.authentication import AuthenticationBackend, BearerTransport, JWTStrategy
 from fastapi_users.db import SQLAlchemyUserDatabase
 from fastapi.security import OAuth2PasswordRequestForm
-from jose import jwt
-from passlib.context import CryptContext
-
-from app.config import settings
-from app.db import User, get_user_db
-from app.utils import send_email
-
-SECRET = settings.secret_key
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from jwt import PyJWTError
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.cache import TTLCache
+from app.config import SettingsBound, settings
+from app.db import User, get_user_db, read_session_maker
+from app.models import UserStatus
+from app.hashing import password_hasher
+from app.schemas import UserCreate
+from app.mailer import enqueue_email
+from app.tokens import KeyRing, RevocationList, key_ring
+
+logger = logging.getLogger(__name__)
+
+# Authenticated users keyed by token subject, shared by every request in this process.
+user_cache = SettingsBound(
+    lambda config: TTLCache(max_size=config.user_cache_max_size, ttl_seconds=config.user_cache_ttl_seconds)
+)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + expires_delta if expires_delta else datetime.now(timezone.utc) + timedelta(minutes=settings.expire_token_minutes)
     to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET, algorithm=settings.algorithm)
+    return key_ring.encode(to_encode)
 
 
 class UserManager(UUIDIDMixin, BaseUserManager[User, uuid.UUID]):
-    reset_password_token_secret = SECRET
-    verification_token_secret = SECRET
+    @property
+    def reset_password_token_secret(self) -> str:
+        return settings.secret_key
 
-    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
-        return pwd_context.verify(plain_password, hashed_password)
+    @property
+    def verification_token_secret(self) -> str:
+        return settings.secret_key
+
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        verified, _ = await password_hasher.verify_and_update(plain_password, hashed_password)
+        return verified
     
-    def get_password_hash(self, password: str) -> str:
-        return pwd_context.hash(password)
+    async def get_password_hash(self, password: str) -> str:
+        return await password_hasher.hash(password)
 
     async def get_by_email(self, email: str) -> Optional[User]:
         return await self.user_db.get_by_email(email)
 
-    async def authenticate(self, request: Optional[Request], form_data: OAuth2PasswordRequestForm) -> Optional[User]:
-        user = await self.user_db.get_by_email(form_data.username)
-        if user is None or not self.verify_password(form_data.password, user.hashed_password):
+    async def authenticate(self, credentials: OAuth2PasswordRequestForm) -> Optional[User]:
+        user = await self.user_db.get_by_email(credentials.username)
+        if user is None:
+            # Spend the same hashing time as a real check so unknown emails are not revealed.
+            await self.get_password_hash(credentials.password)
             return None
+
+        verified, updated_hash = await password_hasher.verify_and_update(credentials.password, user.hashed_password)
+        if not verified:
+            return None
+        if updated_hash is not None:
+            user = await self.user_db.update(user, {"hashed_password": updated_hash})
         return user
 
-    async def on_after_register(self, user: User, request: Optional[Request] = None, background_tasks: BackgroundTasks = None):
+    async def create(self, user_create: UserCreate, safe: bool = False, request: Optional[Request] = None) -> User:
+        await self.validate_password(user_create.password, user_create)
+
+        if await self.user_db.get_by_email(user_create.email) is not None:
+            raise exceptions.UserAlreadyExists()
+
+        user_dict = user_create.create_update_dict() if safe else user_create.create_update_dict_superuser()
+        user_dict["hashed_password"] = await self.get_password_hash(user_dict.pop("password"))
+        if user_dict.get("user_status") is None:
+            user_dict["user_status"] = UserStatus.SIMPLE_USER
+
+        created_user = await self.user_db.create(user_dict)
+        await self.on_after_register(created_user, request)
+        return created_user
+
+    async def _update(self, user: User, update_dict: Dict[str, Any]) -> User:
+        password = update_dict.pop("password", None)
+        if "user_status" in update_dict and update_dict["user_status"] is None:
+            del update_dict["user_status"]
+        if password is not None:
+            await self.validate_password(password, user)
+            update_dict["hashed_password"] = await self.get_password_hash(password)
+        return await super()._update(user, update_dict)
+
+    async def on_after_register(self, user: User, request: Optional[Request] = None):
         token = create_access_token(data={"sub": str(user.id)})
         confirm_url = f"{settings.frontend_url}/verify-email?token={token}"
-        background_tasks.add_task(send_email, subject="Confirm Your Email", recipients=[user.email], body=f"Please click the following link to confirm your email: {confirm_url}")
-        print(f"User {user.id} has registered. Confirmation email sent to {user.email}.")
+        await enqueue_email(
+            self.user_db.session,
+            subject="Confirm Your Email",
+            recipients=[user.email],
+            body=f"Please click the following link to confirm your email: {confirm_url}",
+        )
+        logger.info("User %s has registered. Confirmation email queued.", user.id)
 
     async def on_after_forgot_password(self, user: User, token: str, request: Optional[Request] = None):
-        print(f"User {user.id} has forgot their password. Reset token: {token}")
+        logger.info("User %s has forgot their password.", user.id)
+        logger.debug("Password reset token for user %s: %s", user.id, token)
 
     async def on_after_request_verify(self, user: User, token: str, request: Optional[Request] = None):
-        print(f"Verification requested for user {user.id}. Verification token: {token}")
+        logger.info("Verification requested for user %s.", user.id)
+        logger.debug("Verification token for user %s: %s", user.id, token)
+
+    async def on_after_update(self, user: User, update_dict: dict, request: Optional[Request] = None):
+        user_cache.pop(str(user.id))
+
+    async def on_after_verify(self, user: User, request: Optional[Request] = None):
+        user_cache.pop(str(user.id))
+
+    async def on_after_reset_password(self, user: User, request: Optional[Request] = None):
+        user_cache.pop(str(user.id))
+
+    async def on_before_delete(self, user: User, request: Optional[Request] = None):
+        user_cache.pop(str(user.id))
+
+    async def on_after_delete(self, user: User, request: Optional[Request] = None):
+        user_cache.pop(str(user.id))
 
     async def validate_user(self, user: User) -> None:
         if not user.is_active:
@@ -62,10 +133,93 @@ class UserManager(UUIDIDMixin, BaseUserManager[User, uuid.UUID]):
 async def get_user_manager(user_db: SQLAlchemyUserDatabase = Depends(get_user_db)):
     yield UserManager(user_db)
 
+def _detached_copy(user: User) -> User:
+    snapshot = User(**{column.key: getattr(user, column.key) for column in User.__table__.columns})
+    make_transient_to_detached(snapshot)
+    return snapshot
+
+
+class CachedJWTStrategy(JWTStrategy):
+    # One instance serves every request. Verified claims are cached per token until the
+    # token expires, so a repeat request costs a dictionary lookup instead of an HMAC
+    # check and JSON decode. Revocation is checked on every read, hits included.
+    def __init__(self, key_ring: KeyRing, lifetime_seconds: int, claims_cache_size: int):
+        super().__init__(secret=key_ring.active_key, lifetime_seconds=lifetime_seconds, algorithm=key_ring.algorithm)
+        self.key_ring = key_ring
+        self.claims_cache = TTLCache(max_size=claims_cache_size, ttl_seconds=lifetime_seconds)
+        self.revoked = RevocationList()
+
+    def _claims(self, token: str) -> Optional[Dict[str, Any]]:
+        claims = self.claims_cache.get(token)
+        if claims is None:
+            try:
+                claims = self.key_ring.decode(token, self.token_audience)
+            except PyJWTError:
+                return None
+            ttl = claims["exp"] - time.time() if "exp" in claims else None
+            self.claims_cache.set(token, claims, ttl)
+        # Tokens issued before jti was added are revoked by their own value.
+        if claims.get("jti", token) in self.revoked:
+            return None
+        return claims
+
+    def subject(self, token: str) -> Optional[str]:
+        claims = self._claims(token)
+        return claims.get("sub") if claims is not None else None
+
+    async def read_token(self, token: Optional[str], user_manager: UserManager) -> Optional[User]:
+        if token is None:
+            return None
+
+        user_id = self.subject(token)
+        if user_id is None:
+            return None
+
+        cached = user_cache.get(user_id)
+        if cached is not None:
+            # Bind a copy to this request's session without emitting any SQL.
+            return await user_manager.user_db.session.merge(cached, load=False)
+
+        try:
+            user = await user_manager.get(user_manager.parse_id(user_id))
+        except (exceptions.UserNotExists, exceptions.InvalidID):
+            return None
+        user_cache.set(user_id, _detached_copy(user))
+        return user
+
+    async def write_token(self, user: User) -> str:
+        now = datetime.now(timezone.utc)
+        return self.key_ring.encode({
+            "sub": str(user.id),
+            "aud": self.token_audience,
+            "jti": uuid.uuid4().hex,
+            "iat": now,
+            "exp": now + timedelta(seconds=self.lifetime_seconds),
+        })
+
+    async def destroy_token(self, token: str, user: User) -> None:
+        # Logout. The revocation list is per process, like the claims cache.
+        claims = self._claims(token)
+        if claims is not None:
+            self.revoked.revoke(claims.get("jti", token), claims.get("exp"))
+        self.claims_cache.pop(token)
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.claims_cache.stats(), "revoked": len(self.revoked)}
+
+
 bearer_transport = BearerTransport(tokenUrl="auth/jwt/login")
 
+jwt_strategy = SettingsBound(
+    lambda config: CachedJWTStrategy(
+        key_ring.current(),
+        lifetime_seconds=config.jwt_lifetime_seconds,
+        claims_cache_size=config.jwt_claims_cache_size,
+    )
+)
+
 def get_jwt_strategy() -> JWTStrategy:
-    return JWTStrategy(secret=SECRET, lifetime_seconds=3600)
+    return jwt_strategy
 
 auth_backend = AuthenticationBackend(
     name="jwt",
@@ -76,3 +230,14 @@ auth_backend = AuthenticationBackend(
 fastapi_users = FastAPIUsers[User, uuid.UUID](get_user_manager, [auth_backend])
 
 current_active_user = fastapi_users.current_user(active=True)
+current_superuser = fastapi_users.current_user(active=True, superuser=True)
+
+
+async def authenticate_token(token: Optional[str]) -> Optional[User]:
+    # For long-lived connections (WebSocket, SSE): the session is released as soon as
+    # the user is resolved instead of being held for the lifetime of the stream.
+    async with read_session_maker() as session:
+        user = await get_jwt_strategy().read_token(token, UserManager(SQLAlchemyUserDatabase(session, User)))
+    if user is None or not user.is_active:
+        return None
+    return user
@@ -1,30 +1,166 @@
 from pydantic_settings import BaseSettings
 from pydantic import AnyHttpUrl
-from typing import List, Optional
+from typing import Callable, Dict, Generic, List, Optional, TypeVar
 
 class Settings(BaseSettings):
     database_url: str
+    database_read_url: Optional[str] = None
+    db_echo: bool = False
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_statement_timeout_ms: Optional[int] = None
+    db_prepared_statement_cache_size: int = 100
+    db_pool_warmup: int = 5
+    # Connections the API server may hold per database across all workers (0 = no cap).
+    # `python -m app.serve` splits it between workers; keep it under max_connections.
+    db_max_connections: int = 0
+    schema_check_on_startup: bool = True
+
     secret_key: str
     algorithm: str = "HS256"
     expire_token_minutes: int = 30
+    # Extra HMAC keys by kid, e.g. '{"2024-06": "..."}'. secret_key stays available as
+    # kid "default" (and for tokens without a kid) so rotating keys keeps sessions valid.
+    jwt_signing_keys: Dict[str, str] = {}
+    jwt_active_kid: str = "default"
+    jwt_lifetime_seconds: int = 3600
+    jwt_claims_cache_size: int = 10000
     
     smtp_server: str
     smtp_port: int
     smtp_user: str
     smtp_password: str
+    smtp_start_tls: Optional[bool] = True
     email_from: str
     email_subject: str = "Your Subject Here"
+    email_dispatcher_enabled: bool = True
+    email_batch_size: int = 50
+    email_poll_interval_seconds: float = 5
+    email_max_attempts: int = 5
+    email_retry_base_seconds: float = 30
+    email_rate_per_second: float = 10
+    email_lease_seconds: float = 300
+
+    frontend_url: str = "http://localhost:3000"
     
+    user_cache_ttl_seconds: float = 30
+    user_cache_max_size: int = 10000
+
+    response_cache_max_entries: int = 10000
+    response_cache_ttl_seconds: float = 10
+
+    stats_use_summary_table: bool = True
+
+    idempotency_ttl_seconds: float = 86400
+    idempotency_lease_seconds: float = 60
+    idempotency_cache_max_entries: int = 10000
+    idempotency_purge_interval_seconds: float = 3600
+
+    archive_enabled: bool = True
+    archive_interval_seconds: float = 3600
+    archive_batch_size: int = 500
+    archive_after_days: int = 30
+    soft_delete_retention_days: int = 7
+
+    rate_limit_enabled: bool = True
+    rate_limit_max_keys: int = 100000
+    rate_limit_login: str = "20/minute"
+    rate_limit_login_email: str = "5/minute"
+    rate_limit_register: str = "5/hour"
+    rate_limit_email_ip: str = "10/hour"
+    rate_limit_email_address: str = "3/hour"
+    rate_limit_writes: str = "120/minute"
+
+    admission_max_concurrency: int = 100
+    admission_max_queue: int = 200
+    admission_queue_timeout_seconds: float = 2
+
+    metrics_enabled: bool = True
+    metrics_query_threshold: int = 20
+    metrics_server_timing: bool = False
+    # Bearer token for GET /metrics. Without one the endpoint is not mounted in production.
+    metrics_token: Optional[str] = None
+
+    events_backend: str = "memory"
+    events_channel: str = "change_feed"
+    events_queue_size: int = 256
+    events_heartbeat_seconds: float = 15
+
+    password_hash_workers: int = 0
+    password_hash_executor: str = "thread"
+
     allowed_hosts: List[AnyHttpUrl] = ["http://localhost:3000", "http://localhost"]
     
+    serve_host: str = "127.0.0.1"
+    serve_port: int = 8000
+    serve_workers: int = 0
+    serve_max_requests: int = 10000
+    serve_max_requests_jitter: int = 1000
+    serve_graceful_timeout_seconds: int = 30
+    serve_keep_alive_seconds: int = 5
+    serve_forwarded_allow_ips: str = "127.0.0.1"
+
     log_level: str = "info"
     environment: str = "development"
 
     class Config:
         env_file = ".env"
 
-settings = Settings()
 
+_settings: Optional[Settings] = None
+
+
+def get_settings() -> Settings:
+    # Built on first use rather than at import, so modules that only need models or
+    # schemas do not read the environment.
+    global _settings
+    if _settings is None:
+        _settings = Settings()
+    return _settings
+
+
+def configure(new_settings: Settings) -> None:
+    # SettingsBound singletons are rebuilt on their next use; engines once the current
+    # ones are released with dispose_engines().
+    global _settings
+    _settings = new_settings
+
+
+class _LazySettings:
+    def __getattr__(self, name: str):
+        return getattr(get_settings(), name)
+
+    def __setattr__(self, name: str, value) -> None:
+        setattr(get_settings(), name, value)
+
+
+settings = _LazySettings()
+
+
+T = TypeVar("T")
+
+
+class SettingsBound(Generic[T]):
+    # Module-level singleton built from the settings: created on first use and created
+    # again after configure() installs new settings. Attribute access goes to the
+    # current instance, so `from module import name` always reaches it.
+    def __init__(self, build: Callable[[Settings], T]):
+        object.__setattr__(self, "_build", build)
+        object.__setattr__(self, "_built_for", None)
+        object.__setattr__(self, "_instance", None)
 
+    def current(self) -> T:
+        current_settings = get_settings()
+        if self._built_for is not current_settings:
+            object.__setattr__(self, "_instance", self._build(current_settings))
+            object.__setattr__(self, "_built_for", current_settings)
+        return self._instance
 
+    def __getattr__(self, name: str):
+        return getattr(self.current(), name)
 
+    def __setattr__(self, name: str, value) -> None:
+        setattr(self.current(), name, value)
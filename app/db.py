@@ -1,23 +1,110 @@
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
 from fastapi_users.db import SQLAlchemyUserDatabase
-from typing import AsyncGenerator
-from fastapi import Depends
+from typing import Any, AsyncGenerator, Callable, Dict, Optional
+from fastapi import Depends, Request
 from app.config import settings
-from app.models import User, Base
+from app.metrics import metrics
+from app.models import User
 
+READ_ONLY_METHODS = {"GET", "HEAD", "OPTIONS"}
 
 
-engine = create_async_engine(settings.database_url, echo=True)
-async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
+def _engine_options(url: str) -> Dict[str, Any]:
+    options: Dict[str, Any] = {"echo": settings.db_echo}
 
+    if url.startswith("sqlite"):
+        if ":memory:" in url or "mode=memory" in url:
+            # Every session has to share the single in-memory database.
+            options["poolclass"] = StaticPool
+            options["connect_args"] = {"check_same_thread": False}
+        return options
 
-async def get_db_and_tables():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    options.update(
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+    )
+    if url.startswith("postgresql+asyncpg"):
+        connect_args: Dict[str, Any] = {
+            "prepared_statement_cache_size": settings.db_prepared_statement_cache_size,
+        }
+        if settings.db_statement_timeout_ms is not None:
+            connect_args["server_settings"] = {"statement_timeout": str(settings.db_statement_timeout_ms)}
+        options["connect_args"] = connect_args
+    return options
 
 
-async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
-    async with async_session_maker() as session:
+_engines: Dict[str, AsyncEngine] = {}
+
+
+def _build_engine(name: str, url: str) -> AsyncEngine:
+    engine = _engines[name] = create_async_engine(url, **_engine_options(url))
+    # Here rather than in the app factory, so engines rebuilt after dispose_engines()
+    # are counted too.
+    if settings.metrics_enabled:
+        metrics.instrument_engine(engine, name)
+    return engine
+
+
+# Engines are created on first use, so importing the app (or a CLI that never talks
+# to the database) does not load a driver or open a pool.
+def get_engine() -> AsyncEngine:
+    engine = _engines.get("primary")
+    if engine is None:
+        engine = _build_engine("primary", settings.database_url)
+    return engine
+
+
+def get_read_engine() -> AsyncEngine:
+    if not settings.database_read_url:
+        return get_engine()
+    engine = _engines.get("replica")
+    if engine is None:
+        engine = _build_engine("replica", settings.database_read_url)
+    return engine
+
+
+class LazySessionMaker:
+    # Called like async_sessionmaker; binds to whatever engine is current, so sessions
+    # follow a rebuilt engine after dispose_engines().
+    def __init__(self, get_bind: Callable[[], AsyncEngine]):
+        self.get_bind = get_bind
+        self._bind: Optional[AsyncEngine] = None
+        self._maker: Optional[async_sessionmaker] = None
+
+    def __call__(self, **kwargs) -> AsyncSession:
+        bind = self.get_bind()
+        if bind is not self._bind:
+            self._bind = bind
+            self._maker = async_sessionmaker(bind, expire_on_commit=False)
+        return self._maker(**kwargs)
+
+
+async_session_maker = LazySessionMaker(get_engine)
+read_session_maker = LazySessionMaker(get_read_engine)
+
+
+def pool_stats(engine) -> Dict[str, int]:
+    pool = engine.pool
+    if not hasattr(pool, "checkedout"):
+        return {}
+    return {"size": pool.size(), "checked_out": pool.checkedout(), "overflow": pool.overflow()}
+
+
+async def dispose_engines():
+    # The next session creates fresh engines from the settings current at that point.
+    engines = list(_engines.values())
+    _engines.clear()
+    for engine in engines:
+        await engine.dispose()
+
+
+async def get_async_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    session_maker = read_session_maker if request.method in READ_ONLY_METHODS else async_session_maker
+    async with session_maker() as session:
         yield session
 
 
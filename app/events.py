@@ -0,0 +1,212 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, Iterable, Optional, Set
+
+from sqlalchemy.engine import make_url
+
+from app.config import SettingsBound
+from app.models import Project, Task, User
+from app.permissions import has_full_access, sees_project_tasks
+from app.schemas import ChangeEvent, ProjectRead, TaskRead
+
+logger = logging.getLogger(__name__)
+
+# pg_notify rejects payloads of 8000 bytes or more.
+MAX_NOTIFY_PAYLOAD = 7900
+
+
+def project_event(action: str, project_id: int, project: Optional[Project] = None) -> ChangeEvent:
+    data = ProjectRead.model_validate(project, from_attributes=True).model_dump(mode="json") if project else None
+    return ChangeEvent(
+        resource="project",
+        action=action,
+        id=project_id,
+        project_ids=[project_id],
+        data=data,
+        occurred_at=datetime.now(timezone.utc),
+    )
+
+
+def task_event(
+    action: str,
+    task_id: int,
+    project_ids: Iterable[Optional[int]],
+    assignee_ids: Iterable[Optional[uuid.UUID]],
+    task: Optional[Task] = None,
+) -> ChangeEvent:
+    # A move or reassignment lists both the old and the new project/assignee so
+    # subscribers on either side learn about it.
+    data = TaskRead.model_validate(task, from_attributes=True).model_dump(mode="json") if task else None
+    return ChangeEvent(
+        resource="task",
+        action=action,
+        id=task_id,
+        project_ids=list(dict.fromkeys(pid for pid in project_ids if pid is not None)),
+        assignee_ids=list(dict.fromkeys(aid for aid in assignee_ids if aid is not None)),
+        data=data,
+        occurred_at=datetime.now(timezone.utc),
+    )
+
+
+class Subscription:
+    # Applies app.permissions to events: member_project_ids is loaded once when the
+    # feed opens (None for users who see everything) and grows as the user is given
+    # projects or tasks while it is open.
+    def __init__(
+        self,
+        user: User,
+        project_ids: Set[int],
+        queue_size: int,
+        member_project_ids: Optional[Set[int]] = None,
+    ):
+        self.user_id = user.id
+        self.project_ids = project_ids
+        self.member_project_ids = None if has_full_access(user) else set(member_project_ids or ())
+        self.sees_project_tasks = sees_project_tasks(user)
+        self.queue: "asyncio.Queue[Optional[ChangeEvent]]" = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def _track_membership(self, event: ChangeEvent) -> None:
+        if self.member_project_ids is None:
+            return
+        if event.resource == "task" and self.user_id in event.assignee_ids and event.data:
+            self.member_project_ids.add(event.data["project_id"])
+        elif event.resource == "project" and event.data and event.data.get("owner_id") == str(self.user_id):
+            self.member_project_ids.add(event.id)
+
+    def can_see(self, event: ChangeEvent) -> bool:
+        if self.project_ids and self.project_ids.isdisjoint(event.project_ids):
+            return False
+        self._track_membership(event)
+        if event.resource == "task" and not self.sees_project_tasks:
+            return self.user_id in event.assignee_ids
+        return self.member_project_ids is None or not self.member_project_ids.isdisjoint(event.project_ids)
+
+    def offer(self, event: ChangeEvent) -> bool:
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            # A consumer that cannot keep up is cut off instead of buffering without
+            # bound; the None sentinel tells it to close so the client can resync.
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+            return False
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[ChangeEvent]:
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class PostgresEventBroker:
+    # Fans events out across worker processes: every worker LISTENs on the same
+    # channel, including the one that sent the NOTIFY.
+    def __init__(self, database_url: str, channel: str):
+        self.dsn = make_url(database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self.channel = channel
+        self._deliver: Optional[Callable[[ChangeEvent], None]] = None
+        self._conn = None
+        self._lock = asyncio.Lock()
+
+    async def start(self, deliver: Callable[[ChangeEvent], None]) -> None:
+        self._deliver = deliver
+        await self._connect()
+
+    async def _connect(self):
+        # Imported here so the memory backend never loads the driver.
+        import asyncpg
+
+        self._conn = await asyncpg.connect(self.dsn)
+        await self._conn.add_listener(self.channel, self._on_notify)
+
+    def _on_notify(self, connection, pid, channel, payload: str) -> None:
+        try:
+            event = ChangeEvent.model_validate_json(payload)
+        except ValueError:
+            logger.warning("Ignoring malformed change event on %s", channel)
+            return
+        self._deliver(event)
+
+    async def publish(self, event: ChangeEvent) -> None:
+        payload = event.model_dump_json()
+        if len(payload.encode()) > MAX_NOTIFY_PAYLOAD:
+            payload = event.model_copy(update={"data": None}).model_dump_json()
+        async with self._lock:
+            if self._conn is None or self._conn.is_closed():
+                await self._connect()
+            await self._conn.execute("SELECT pg_notify($1, $2)", self.channel, payload)
+
+    async def stop(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None and not conn.is_closed():
+            await conn.close()
+
+
+class EventBus:
+    def __init__(self, queue_size: int, broker: Optional[PostgresEventBroker] = None):
+        self.queue_size = queue_size
+        self.broker = broker
+        self.subscriptions: Set[Subscription] = set()
+        self.published = 0
+        self.dropped_subscribers = 0
+
+    def subscribe(
+        self, user: User, project_ids: Iterable[int] = (), member_project_ids: Optional[Set[int]] = None
+    ) -> Subscription:
+        subscription = Subscription(user, set(project_ids), self.queue_size, member_project_ids)
+        self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.subscriptions.discard(subscription)
+
+    def deliver(self, event: ChangeEvent) -> None:
+        for subscription in list(self.subscriptions):
+            if subscription.can_see(event) and not subscription.offer(event):
+                self.unsubscribe(subscription)
+                self.dropped_subscribers += 1
+
+    async def publish(self, *events: ChangeEvent) -> None:
+        # Called after commit; a failed fan-out must not fail the write that caused it.
+        for event in events:
+            self.published += 1
+            try:
+                if self.broker is not None:
+                    await self.broker.publish(event)
+                else:
+                    self.deliver(event)
+            except Exception:
+                logger.exception("Failed to publish %s %s event", event.resource, event.action)
+
+    async def start(self) -> None:
+        if self.broker is not None:
+            await self.broker.start(self.deliver)
+
+    async def stop(self) -> None:
+        if self.broker is not None:
+            await self.broker.stop()
+        for subscription in list(self.subscriptions):
+            subscription.offer(None)
+        self.subscriptions.clear()
+
+    def stats(self):
+        return {
+            "subscribers": len(self.subscriptions),
+            "published": self.published,
+            "dropped_subscribers": self.dropped_subscribers,
+        }
+
+
+event_bus = SettingsBound(
+    lambda config: EventBus(
+        queue_size=config.events_queue_size,
+        broker=(
+            PostgresEventBroker(config.database_url, config.events_channel)
+            if config.events_backend == "postgres"
+            else None
+        ),
+    )
+)
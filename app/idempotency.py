@@ -0,0 +1,342 @@
+import asyncio
+import hashlib
+import json
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response, status
+from fastapi.routing import APIRoute
+from sqlalchemy import and_, delete, or_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.future import select
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.auth import jwt_strategy
+from app.cache import TTLCache
+from app.config import SettingsBound
+from app.db import async_session_maker
+from app.models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+IDEMPOTENT_METHODS = {"POST", "PUT", "PATCH"}
+MAX_KEY_LENGTH = 255
+# Regenerated on replay rather than stored.
+SKIPPED_HEADERS = {"content-length", "date", "server", "set-cookie"}
+# Transient outcomes: the client should be able to retry them with the same key.
+UNSTORED_STATUSES = {status.HTTP_409_CONFLICT, status.HTTP_429_TOO_MANY_REQUESTS}
+
+class StoredResponse:
+    __slots__ = ("fingerprint", "status_code", "body", "headers")
+
+    def __init__(self, fingerprint: str, status_code: int, body: bytes, headers: Dict[str, str]):
+        self.fingerprint = fingerprint
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers
+
+    def to_response(self) -> Response:
+        return Response(
+            content=self.body, status_code=self.status_code, headers={**self.headers, REPLAYED_HEADER: "true"}
+        )
+
+
+def _fingerprint(request: Request, body: bytes) -> str:
+    digest = hashlib.sha256(f"{request.method} {request.url.path}?{request.url.query}\n".encode())
+    digest.update(body)
+    return digest.hexdigest()
+
+
+def _bearer_user_id(request: Request) -> Optional[uuid.UUID]:
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    subject = jwt_strategy.subject(token)
+    try:
+        return uuid.UUID(subject) if subject is not None else None
+    except ValueError:
+        return None
+
+
+def _replay_body(body: bytes, receive: Receive) -> Receive:
+    # The body was read for the fingerprint; the route reads it again from here.
+    pending = [{"type": "http.request", "body": body, "more_body": False}]
+
+    async def replay() -> Message:
+        return pending.pop() if pending else await receive()
+
+    return replay
+
+
+def _storable(status_code: int) -> bool:
+    return status_code < 500 and status_code not in UNSTORED_STATUSES
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+# Keys are scoped to the authenticated user. The first request claims the key with a
+# row in idempotency_keys and its response is stored there and in a local cache; retries
+# are answered from either without running the route. Duplicates arriving while the
+# first is running wait for it in the same process, or get 409 from other workers.
+class IdempotencyStore:
+    def __init__(
+        self,
+        session_maker: async_sessionmaker,
+        ttl_seconds: float,
+        lease_seconds: float,
+        cache_max_entries: int,
+        purge_interval: float,
+    ):
+        self.session_maker = session_maker
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.lease = timedelta(seconds=lease_seconds)
+        self.purge_interval = purge_interval
+        self.cache = TTLCache(max_size=cache_max_entries, ttl_seconds=ttl_seconds)
+        self._in_flight: Dict[Tuple[uuid.UUID, str], asyncio.Future] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.replayed = 0
+        self.coalesced = 0
+        self.conflicts = 0
+
+    async def handle(self, key: str, scope: Scope, receive: Receive, send: Send, app: ASGIApp) -> None:
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{IDEMPOTENCY_HEADER} must be 1 to {MAX_KEY_LENGTH} characters.",
+            )
+        request = Request(scope, receive)
+        user_id = _bearer_user_id(request)
+        if user_id is None:
+            # The route rejects the request itself; there is nobody to scope the key to.
+            return await app(scope, receive, send)
+
+        body = await request.body()
+        receive = _replay_body(body, receive)
+        fingerprint = _fingerprint(request, body)
+        entry = (user_id, key)
+        while True:
+            stored = self.cache.get(entry)
+            if stored is not None:
+                return await self._replay(stored, fingerprint)(scope, receive, send)
+            in_flight = self._in_flight.get(entry)
+            if in_flight is None:
+                break
+            # Resolves once the first request has stored its response or released the key.
+            self.coalesced += 1
+            await asyncio.shield(in_flight)
+
+        self._in_flight[entry] = asyncio.get_running_loop().create_future()
+        try:
+            stored = await self._claim(user_id, key, fingerprint)
+            if stored is None:
+                respond = await self._execute(user_id, key, fingerprint, scope, receive, app)
+            else:
+                self.cache.set(entry, stored)
+                respond = self._replay(stored, fingerprint)
+        finally:
+            self._in_flight.pop(entry).set_result(None)
+        await respond(scope, receive, send)
+
+    def _replay(self, stored: StoredResponse, fingerprint: str) -> Response:
+        if stored.fingerprint != fingerprint:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"This {IDEMPOTENCY_HEADER} was already used for a different request.",
+            )
+        self.replayed += 1
+        return stored.to_response()
+
+    def _insert(self, session: AsyncSession):
+        dialect_insert = postgresql.insert if session.bind.dialect.name == "postgresql" else sqlite.insert
+        return dialect_insert(IdempotencyKey)
+
+    async def _claim(self, user_id: uuid.UUID, key: str, fingerprint: str) -> Optional[StoredResponse]:
+        now = _utcnow()
+        claim = {
+            "fingerprint": fingerprint,
+            "status_code": None,
+            "body": None,
+            "headers": None,
+            "locked_until": now + self.lease,
+            "expires_at": now + self.ttl,
+        }
+        async with self.session_maker() as session:
+            claimed = await session.scalar(
+                self._insert(session)
+                .values(user_id=user_id, key=key, **claim)
+                .on_conflict_do_nothing()
+                .returning(IdempotencyKey.key)
+            )
+            if claimed is None:
+                # Take over an expired key, or one whose request died before storing a result.
+                claimed = await session.scalar(
+                    update(IdempotencyKey)
+                    .where(
+                        IdempotencyKey.user_id == user_id,
+                        IdempotencyKey.key == key,
+                        or_(
+                            IdempotencyKey.expires_at <= now,
+                            and_(IdempotencyKey.status_code.is_(None), IdempotencyKey.locked_until <= now),
+                        ),
+                    )
+                    .values(**claim)
+                    .returning(IdempotencyKey.key)
+                )
+            row = None
+            if claimed is None:
+                row = await session.scalar(
+                    select(IdempotencyKey).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+                )
+            await session.commit()
+
+        if claimed is not None:
+            return None
+        if row is None or row.status_code is None:
+            self.conflicts += 1
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"A request with this {IDEMPOTENCY_HEADER} is still in progress.",
+                headers={"Retry-After": "1"},
+            )
+        return StoredResponse(row.fingerprint, row.status_code, row.body, row.headers or {})
+
+    async def _execute(
+        self, user_id: uuid.UUID, key: str, fingerprint: str, scope: Scope, receive: Receive, app: ASGIApp
+    ) -> ASGIApp:
+        # The response is held back until it is stored, so a client that has seen it
+        # always gets the replay on retry. Runs outside the route's dependency scope:
+        # the request session has been closed by the time the result is stored.
+        messages: List[Message] = []
+
+        async def capture(message: Message) -> None:
+            messages.append(message)
+
+        try:
+            await app(scope, receive, capture)
+        except HTTPException as exc:
+            if _storable(exc.status_code):
+                body = json.dumps({"detail": exc.detail}).encode()
+                headers = {"content-type": "application/json", **(exc.headers or {})}
+                await self._store(user_id, key, StoredResponse(fingerprint, exc.status_code, body, headers))
+            else:
+                await self._release(user_id, key)
+            raise
+        except BaseException:
+            await self._release(user_id, key)
+            raise
+
+        start = next((message for message in messages if message["type"] == "http.response.start"), None)
+        if start is None or not _storable(start["status"]):
+            await self._release(user_id, key)
+        else:
+            headers = {
+                name.decode("latin-1"): value.decode("latin-1")
+                for name, value in start.get("headers", [])
+                if name.decode("latin-1").lower() not in SKIPPED_HEADERS
+            }
+            body = b"".join(message.get("body", b"") for message in messages if message["type"] == "http.response.body")
+            await self._store(user_id, key, StoredResponse(fingerprint, start["status"], body, headers))
+
+        async def forward(scope: Scope, receive: Receive, send: Send) -> None:
+            for message in messages:
+                await send(message)
+
+        return forward
+
+    async def _store(self, user_id: uuid.UUID, key: str, stored: StoredResponse) -> None:
+        self.cache.set((user_id, key), stored)
+        async with self.session_maker() as session:
+            await session.execute(
+                update(IdempotencyKey)
+                .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+                .values(
+                    status_code=stored.status_code,
+                    body=stored.body,
+                    headers=stored.headers,
+                    locked_until=None,
+                    expires_at=_utcnow() + self.ttl,
+                )
+            )
+            await session.commit()
+
+    async def _release(self, user_id: uuid.UUID, key: str) -> None:
+        async with self.session_maker() as session:
+            await session.execute(
+                delete(IdempotencyKey).where(
+                    IdempotencyKey.user_id == user_id,
+                    IdempotencyKey.key == key,
+                    IdempotencyKey.status_code.is_(None),
+                )
+            )
+            await session.commit()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="idempotency-purge")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.purge_expired()
+            except Exception:
+                logger.exception("Purging expired idempotency keys failed")
+            await asyncio.sleep(self.purge_interval)
+
+    async def purge_expired(self) -> int:
+        async with self.session_maker() as session:
+            result = await session.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= _utcnow()))
+            await session.commit()
+        return result.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "cached": len(self.cache),
+            "in_flight": len(self._in_flight),
+            "replayed": self.replayed,
+            "coalesced": self.coalesced,
+            "conflicts": self.conflicts,
+        }
+
+
+idempotency_store = SettingsBound(
+    lambda config: IdempotencyStore(
+        async_session_maker,
+        ttl_seconds=config.idempotency_ttl_seconds,
+        lease_seconds=config.idempotency_lease_seconds,
+        cache_max_entries=config.idempotency_cache_max_entries,
+        purge_interval=config.idempotency_purge_interval_seconds,
+    )
+)
+
+
+class IdempotentRoute(APIRoute):
+    # Route class for routers whose writes honour the Idempotency-Key header. Wraps the
+    # whole route rather than its handler so results are stored after dependencies close.
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
+        headers = Headers(scope=scope)
+        key = headers.get(IDEMPOTENCY_HEADER)
+        # Uploads are not buffered in memory just to fingerprint them.
+        if (
+            scope["method"] not in IDEMPOTENT_METHODS
+            or key is None
+            or headers.get("content-type", "").startswith("multipart/")
+        ):
+            return await super().handle(scope, receive, send)
+        await idempotency_store.handle(key, scope, receive, send, super().handle)
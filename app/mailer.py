@@ -0,0 +1,186 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+import aiosmtplib
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.future import select
+
+from app.config import SettingsBound, settings
+from app.db import async_session_maker
+from app.models import EmailStatus, OutboundEmail
+from app.utils import build_email_message
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRY_DELAY_SECONDS = 3600
+
+
+class EmailDispatcher:
+    def __init__(
+        self,
+        session_maker: async_sessionmaker,
+        batch_size: int,
+        poll_interval: float,
+        max_attempts: int,
+        retry_base_seconds: float,
+        rate_per_second: float,
+        lease_seconds: float,
+    ):
+        self.session_maker = session_maker
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.send_interval = 1 / rate_per_second if rate_per_second > 0 else 0
+        self.lease_seconds = lease_seconds
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._smtp: Optional[aiosmtplib.SMTP] = None
+        self._last_send = 0.0
+        self.sent = 0
+        self.failed = 0
+
+    def notify(self) -> None:
+        self._wakeup.set()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="email-dispatcher")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._disconnect()
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                claimed = await self.drain_once()
+            except Exception:
+                logger.exception("Email dispatch round failed")
+                claimed = 0
+
+            if claimed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def drain_once(self) -> int:
+        emails = await self._claim()
+        # No transaction is open while sending; each outcome is written on its own.
+        for email in emails:
+            try:
+                await self._send(email)
+            except (aiosmtplib.SMTPException, OSError) as exc:
+                await self._disconnect()
+                values = self._failure(email, exc)
+            else:
+                values = {"status": EmailStatus.SENT, "sent_at": datetime.now(timezone.utc)}
+                self.sent += 1
+            await self._record(email.email_id, values)
+        return len(emails)
+
+    async def _claim(self) -> List[OutboundEmail]:
+        # Claiming counts the attempt and moves next_attempt_at past the time the batch
+        # needs at the send rate, then commits. Other workers skip the rows until then,
+        # and if this one dies mid-batch they become due again when the lease runs out.
+        async with self.session_maker() as session:
+            now = datetime.now(timezone.utc)
+            result = await session.scalars(
+                select(OutboundEmail)
+                .where(OutboundEmail.status == EmailStatus.PENDING, OutboundEmail.next_attempt_at <= now)
+                .order_by(OutboundEmail.email_id)
+                .limit(self.batch_size)
+                # Several workers may drain the same outbox; each claims a disjoint batch.
+                .with_for_update(skip_locked=True)
+            )
+            emails = result.all()
+            leased_until = now + timedelta(seconds=self.lease_seconds + len(emails) * self.send_interval)
+            for email in emails:
+                email.attempts += 1
+                email.next_attempt_at = leased_until
+            await session.commit()
+        return emails
+
+    async def _record(self, email_id: int, values: Dict[str, Any]) -> None:
+        async with self.session_maker() as session:
+            await session.execute(update(OutboundEmail).where(OutboundEmail.email_id == email_id).values(**values))
+            await session.commit()
+
+    def _failure(self, email: OutboundEmail, exc: Exception) -> Dict[str, Any]:
+        values: Dict[str, Any] = {"last_error": str(exc)[:500]}
+        if email.attempts >= self.max_attempts:
+            self.failed += 1
+            logger.error("Giving up on email %s after %s attempts: %s", email.email_id, email.attempts, exc)
+            return {**values, "status": EmailStatus.FAILED}
+
+        delay = min(self.retry_base_seconds * 2 ** (email.attempts - 1), MAX_RETRY_DELAY_SECONDS)
+        logger.warning("Email %s failed (attempt %s), retrying in %ss: %s", email.email_id, email.attempts, delay, exc)
+        return {**values, "next_attempt_at": datetime.now(timezone.utc) + timedelta(seconds=delay)}
+
+    async def _send(self, email: OutboundEmail) -> None:
+        loop = asyncio.get_running_loop()
+        wait = self._last_send + self.send_interval - loop.time()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+        message = build_email_message(email.subject, email.recipients, email.body)
+        smtp = await self._connection()
+        try:
+            await smtp.send_message(message)
+        except aiosmtplib.SMTPServerDisconnected:
+            # Relays drop idle connections; reconnect once before counting a failure.
+            await self._disconnect()
+            smtp = await self._connection()
+            await smtp.send_message(message)
+        self._last_send = loop.time()
+
+    async def _connection(self) -> aiosmtplib.SMTP:
+        if self._smtp is None or not self._smtp.is_connected:
+            smtp = aiosmtplib.SMTP(
+                hostname=settings.smtp_server,
+                port=settings.smtp_port,
+                username=settings.smtp_user or None,
+                password=settings.smtp_password or None,
+                start_tls=settings.smtp_start_tls,
+            )
+            await smtp.connect()
+            self._smtp = smtp
+        return self._smtp
+
+    async def _disconnect(self) -> None:
+        smtp, self._smtp = self._smtp, None
+        if smtp is not None and smtp.is_connected:
+            try:
+                await smtp.quit()
+            except (aiosmtplib.SMTPException, OSError):
+                smtp.close()
+
+
+email_dispatcher = SettingsBound(
+    lambda config: EmailDispatcher(
+        async_session_maker,
+        batch_size=config.email_batch_size,
+        poll_interval=config.email_poll_interval_seconds,
+        max_attempts=config.email_max_attempts,
+        retry_base_seconds=config.email_retry_base_seconds,
+        rate_per_second=config.email_rate_per_second,
+        lease_seconds=config.email_lease_seconds,
+    )
+)
+
+
+async def enqueue_email(session: AsyncSession, subject: str, recipients: Iterable[str], body: str) -> None:
+    session.add(OutboundEmail(subject=subject, recipients=list(recipients), body=body))
+    await session.commit()
+    email_dispatcher.notify()
@@ -0,0 +1,252 @@
+import logging
+import time
+import weakref
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labels, key)} {value}" for key, value in self.values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, labels: Labels = (), amount: float = 1) -> None:
+        self.inc(labels, -amount)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str], buckets: Sequence[float]):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self.series: Dict[Labels, list] = {}
+
+    def observe(self, labels: Labels, value: float) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total) in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_label = f'le="{le}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, bucket_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+class Metrics:
+    def __init__(self):
+        self.requests = Counter("http_requests_total", "Requests handled.", ("method", "route", "status"))
+        self.latency = Histogram(
+            "http_request_duration_seconds", "Time to the end of the response body.", ("method", "route"), LATENCY_BUCKETS
+        )
+        self.response_size = Histogram(
+            "http_response_size_bytes", "Response body size.", ("method", "route"), SIZE_BUCKETS
+        )
+        self.in_flight = Gauge("http_requests_in_flight", "Requests currently being handled.", ("method",))
+        self.request_queries = Histogram(
+            "http_request_db_queries", "SQL statements executed per request.", ("method", "route"), QUERY_COUNT_BUCKETS
+        )
+        self.request_db_time = Histogram(
+            "http_request_db_duration_seconds", "Time spent in SQL per request.", ("method", "route"), LATENCY_BUCKETS
+        )
+        self.query_threshold_exceeded = Counter(
+            "http_requests_query_threshold_exceeded_total",
+            "Requests that ran more SQL statements than the configured threshold (likely N+1).",
+            ("method", "route"),
+        )
+        self.db_queries = Counter("db_queries_total", "SQL statements executed.", ("engine",))
+        self.db_time = Counter("db_query_duration_seconds_total", "Time spent executing SQL.", ("engine",))
+        self.collectors: Dict[str, Callable[[], Dict[str, float]]] = {}
+        self._instrumented = weakref.WeakSet()
+
+    def register_collector(self, prefix: str, collect: Callable[[], Dict[str, float]]) -> None:
+        # Component stats (caches, pools, queues) sampled as gauges on every scrape.
+        self.collectors[prefix] = collect
+
+    def instrument_engine(self, engine: AsyncEngine, name: str) -> None:
+        # Listeners are added once per engine, however often it is passed in.
+        sync_engine = engine.sync_engine
+        if sync_engine in self._instrumented:
+            return
+        self._instrumented.add(sync_engine)
+
+        @event.listens_for(sync_engine, "before_cursor_execute")
+        def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+        @event.listens_for(sync_engine, "after_cursor_execute")
+        def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - conn.info["query_started_at"].pop()
+            self.db_queries.inc((name,))
+            self.db_time.inc((name,), elapsed)
+            stats = _request_stats.get()
+            if stats is not None:
+                stats.queries += 1
+                stats.db_seconds += elapsed
+
+    def render(self) -> str:
+        lines = []
+        for metric in (
+            self.requests,
+            self.latency,
+            self.response_size,
+            self.in_flight,
+            self.request_queries,
+            self.request_db_time,
+            self.query_threshold_exceeded,
+            self.db_queries,
+            self.db_time,
+        ):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+
+        for prefix, collect in self.collectors.items():
+            try:
+                stats = collect()
+            except Exception:
+                logger.exception("Metrics collector %s failed", prefix)
+                continue
+            for key, value in stats.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"# TYPE {prefix}_{key} gauge")
+                    lines.append(f"{prefix}_{key} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+_route_labels: Dict[int, str] = {}
+
+
+def _route_label(scope: Scope) -> str:
+    # Label by route template, not raw path, to keep cardinality bounded. Routes from
+    # an included router may only know their own path, so the router prefix is
+    # recovered from the request path (prefixes here are static).
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    label = _route_labels.get(id(route))
+    if label is None:
+        path, label = scope["path"], route.path
+        for index, char in enumerate(path):
+            if char == "/" and route.path_regex.match(path[index:]):
+                label = path[:index] + route.path
+                break
+        _route_labels[id(route)] = label
+    return label
+
+
+class MetricsMiddleware:
+    # Pure ASGI so streamed bodies are measured to their last chunk and nothing is buffered.
+    def __init__(self, app: ASGIApp, query_threshold: int = 0, server_timing: bool = False):
+        self.app = app
+        self.query_threshold = query_threshold
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+        size = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    app_ms = (time.perf_counter() - started) * 1000
+                    timing = (
+                        f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries", app;dur={app_ms:.1f}'
+                    )
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode())]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        metrics.in_flight.inc((method,))
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.in_flight.dec((method,))
+            _request_stats.reset(token)
+            route = _route_label(scope)
+            labels = (method, route)
+            metrics.requests.inc((method, route, str(status_code)))
+            metrics.latency.observe(labels, time.perf_counter() - started)
+            metrics.response_size.observe(labels, size)
+            metrics.request_queries.observe(labels, stats.queries)
+            metrics.request_db_time.observe(labels, stats.db_seconds)
+            if self.query_threshold and stats.queries > self.query_threshold:
+                metrics.query_threshold_exceeded.inc(labels)
+                logger.warning(
+                    "%s %s ran %s SQL statements (threshold %s); possible N+1",
+                    method, route, stats.queries, self.query_threshold,
+                )
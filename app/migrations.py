@@ -0,0 +1,386 @@
+import argparse
+import asyncio
+import logging
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import (
+    JSON, Boolean, Column, DateTime, Enum, ForeignKey, Index, Integer, MetaData, String, Table, Text, func, inspect,
+    insert, literal, select, text, union,
+)
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateTable
+
+from app.db import dispose_engines, get_engine
+from app.models import (
+    GUID, ArchivedProject, ArchivedTask, EmailStatus, IdempotencyKey, Project, ProjectMember, ProjectPriority,
+    ProjectProcessStatus, ProjectTaskCount, Task, UserStatus,
+)
+from app.stats import UNASSIGNED
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary key for pg_advisory_xact_lock so concurrent deploys apply migrations one at a time.
+MIGRATION_LOCK_ID = 72_310_001
+
+schema_version = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+
+# The tables as migration 1 shipped them. Later migrations change the live models, so
+# the baseline must not read from them.
+baseline = MetaData()
+
+Table(
+    "users_base",
+    baseline,
+    Column("full_name", String, nullable=True),
+    Column("email", String, unique=True, index=True, nullable=False),
+    Column("user_status", Enum(UserStatus), nullable=False),
+    Column("id", GUID, primary_key=True),
+    Column("hashed_password", String(length=1024), nullable=False),
+    Column("is_active", Boolean, nullable=False),
+    Column("is_superuser", Boolean, nullable=False),
+    Column("is_verified", Boolean, nullable=False),
+)
+
+Table(
+    "projects_info",
+    baseline,
+    Column("project_id", Integer, primary_key=True),
+    Column("project_name", String, unique=True),
+    Column("project_status", Enum(ProjectProcessStatus), nullable=False),
+    Column("project_priority", Enum(ProjectPriority), nullable=False),
+    Column("owner_id", GUID, ForeignKey("users_base.id")),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("updated_at", DateTime(timezone=True), server_default=func.now()),
+    Index("ix_projects_info_created_at_project_id", "created_at", "project_id"),
+    Index("ix_projects_info_owner_id_created_at", "owner_id", "created_at"),
+)
+
+Table(
+    "tasks",
+    baseline,
+    Column("task_id", Integer, primary_key=True),
+    Column("task_name", String, unique=True),
+    Column("project_id", Integer, ForeignKey("projects_info.project_id")),
+    Column("assignee_id", GUID, ForeignKey("users_base.id")),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("updated_at", DateTime(timezone=True), server_default=func.now()),
+    Index("ix_tasks_project_id_created_at", "project_id", "created_at"),
+    Index("ix_tasks_assignee_id_updated_at", "assignee_id", "updated_at"),
+)
+
+Table(
+    "email_outbox",
+    baseline,
+    Column("email_id", Integer, primary_key=True),
+    Column("subject", String, nullable=False),
+    Column("recipients", JSON, nullable=False),
+    Column("body", Text, nullable=False),
+    Column("status", Enum(EmailStatus), nullable=False),
+    Column("attempts", Integer, nullable=False),
+    Column("last_error", String, nullable=True),
+    Column("next_attempt_at", DateTime(timezone=True), server_default=func.now()),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("sent_at", DateTime(timezone=True), nullable=True),
+    Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+)
+
+
+def _create_tables(conn: Connection, *tables: Table) -> None:
+    for table in tables:
+        table.create(conn, checkfirst=True)
+        # create(checkfirst=True) skips existing tables entirely, indexes included.
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def _add_columns(conn: Connection, table: Table, *names: str) -> None:
+    # Tables created after the model gained these columns already have them.
+    existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+    for name in names:
+        if name not in existing:
+            column_type = table.c[name].type.compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {name} {column_type}"))
+
+
+def _rebuild_table(conn: Connection, table: Table) -> None:
+    # SQLite cannot change a primary key or a column default in place: the rows are
+    # copied into a fresh table created from the model, which then takes over the name
+    # so foreign keys pointing at it still resolve. Dropping the old table drops its
+    # indexes and triggers; callers recreate the triggers.
+    new_name = f"{table.name}_new"
+    columns = ", ".join(column["name"] for column in inspect(conn).get_columns(table.name))
+    ddl = str(CreateTable(table).compile(dialect=conn.dialect))
+    conn.exec_driver_sql(ddl.replace(f"CREATE TABLE {table.name} ", f"CREATE TABLE {new_name} ", 1))
+    conn.execute(text(f"INSERT INTO {new_name} ({columns}) SELECT {columns} FROM {table.name}"))
+    conn.execute(text(f"DROP TABLE {table.name}"))
+    conn.execute(text(f"ALTER TABLE {new_name} RENAME TO {table.name}"))
+    for index in table.indexes:
+        index.create(conn)
+
+
+def _baseline(conn: Connection) -> None:
+    _create_tables(conn, *baseline.sorted_tables)
+
+
+def _project_task_counts(conn: Connection) -> None:
+    _create_tables(conn, ProjectTaskCount.__table__)
+    # Same as app.stats.rebuild_task_counts, but over the tasks table as it was before
+    # soft deletes.
+    tasks = baseline.tables["tasks"]
+    assignee = func.coalesce(tasks.c.assignee_id, literal(UNASSIGNED, GUID))
+    conn.execute(
+        ProjectTaskCount.__table__.insert().from_select(
+            ["project_id", "assignee_id", "task_count"],
+            select(tasks.c.project_id, assignee, func.count())
+            .where(tasks.c.project_id.is_not(None))
+            .group_by(tasks.c.project_id, assignee),
+        )
+    )
+
+
+SEARCH_SOURCES = (("projects_info", "project_id", "project_name", 0), ("tasks", "task_id", "task_name", 1))
+
+
+def _search_indexes(conn: Connection) -> None:
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        for table, column in (("projects_info", "project_name"), ("tasks", "task_name")):
+            # Trigram indexes serve prefix LIKE and fuzzy matches; tsvector indexes serve
+            # full-text queries. The expressions must match app.search verbatim.
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_{table}_{column}_trgm "
+                f"ON {table} USING gin (lower({column}) gin_trgm_ops)"
+            ))
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_{table}_{column}_tsv "
+                f"ON {table} USING gin (to_tsvector('simple'::regconfig, {column}))"
+            ))
+        return
+
+    if conn.dialect.name != "sqlite":
+        logger.warning("No search index for dialect %s; search will not be available.", conn.dialect.name)
+        return
+
+    # FTS5 fallback. rowid = id * 2 for projects and id * 2 + 1 for tasks, so the
+    # triggers address rows by rowid instead of scanning the index.
+    conn.execute(text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(name, tokenize='unicode61', prefix='2 3')"
+    ))
+    _search_triggers(conn)
+    for table, id_column, name_column, kind in SEARCH_SOURCES:
+        conn.execute(text(
+            f"INSERT OR REPLACE INTO search_index (rowid, name) "
+            f"SELECT {id_column} * 2 + {kind}, {name_column} FROM {table} WHERE {name_column} IS NOT NULL"
+        ))
+
+
+def _search_triggers(conn: Connection) -> None:
+    for table, id_column, name_column, kind in SEARCH_SOURCES:
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO search_index (rowid, name) VALUES (new.{id_column} * 2 + {kind}, new.{name_column}); END"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_update AFTER UPDATE OF {name_column} ON {table} BEGIN "
+            f"UPDATE search_index SET name = new.{name_column} WHERE rowid = old.{id_column} * 2 + {kind}; END"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table} BEGIN "
+            f"DELETE FROM search_index WHERE rowid = old.{id_column} * 2 + {kind}; END"
+        ))
+
+
+def _soft_delete_and_archive(conn: Connection) -> None:
+    _add_columns(conn, Project.__table__, "deleted_at")
+    _add_columns(conn, Task.__table__, "deleted_at")
+    for table in ("projects_info", "tasks"):
+        # Only soft-deleted rows are indexed; the archiver is the only reader.
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_deleted_at ON {table} (deleted_at) WHERE deleted_at IS NOT NULL"
+        ))
+    _create_tables(conn, ArchivedProject.__table__, ArchivedTask.__table__)
+
+    if conn.dialect.name == "sqlite":
+        _soft_delete_triggers(conn)
+
+
+def _soft_delete_triggers(conn: Connection) -> None:
+    # Postgres search filters on deleted_at; the FTS5 index drops soft-deleted rows instead.
+    for table, id_column, _, kind in SEARCH_SOURCES:
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_soft_delete AFTER UPDATE OF deleted_at ON {table} "
+            f"WHEN new.deleted_at IS NOT NULL BEGIN "
+            f"DELETE FROM search_index WHERE rowid = old.{id_column} * 2 + {kind}; END"
+        ))
+
+
+def _idempotency_keys(conn: Connection) -> None:
+    _create_tables(conn, IdempotencyKey.__table__)
+
+
+def _project_members(conn: Connection) -> None:
+    _create_tables(conn, ProjectMember.__table__)
+    # Backfill from current owners and assignees; UNION drops the duplicates.
+    conn.execute(
+        insert(ProjectMember).from_select(
+            ["project_id", "user_id"],
+            union(
+                select(Project.project_id, Project.owner_id).where(Project.owner_id.is_not(None)),
+                select(Task.project_id, Task.assignee_id).where(
+                    Task.project_id.is_not(None), Task.assignee_id.is_not(None)
+                ),
+            ),
+        )
+    )
+
+
+def _archive_surrogate_keys(conn: Connection) -> None:
+    # Tables created by migration 4 after the model change already have archive_id.
+    # A project or task id reused before migration 8 just means two archive rows.
+    for table in (ArchivedProject.__table__, ArchivedTask.__table__):
+        if "archive_id" in {column["name"] for column in inspect(conn).get_columns(table.name)}:
+            continue
+        if conn.dialect.name == "sqlite":
+            _rebuild_table(conn, table)
+            continue
+        primary_key = inspect(conn).get_pk_constraint(table.name)["name"]
+        conn.execute(text(f"ALTER TABLE {table.name} DROP CONSTRAINT {primary_key}"))
+        conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN archive_id SERIAL PRIMARY KEY"))
+
+
+def _autoincrement_ids(conn: Connection) -> None:
+    # Without AUTOINCREMENT SQLite hands out max(rowid) + 1, reusing the id of an
+    # archived top row. Postgres sequences never go back.
+    if conn.dialect.name != "sqlite":
+        return
+    for table, archive in ((Project.__table__, ArchivedProject.__table__), (Task.__table__, ArchivedTask.__table__)):
+        _rebuild_table(conn, table)
+        # Start past ids that only live on in the archive as well.
+        id_column = table.primary_key.columns[0].name
+        conn.execute(text(f"DELETE FROM sqlite_sequence WHERE name = '{table.name}'"))
+        conn.execute(text(
+            f"INSERT INTO sqlite_sequence (name, seq) SELECT '{table.name}', "
+            f"max(coalesce((SELECT max({id_column}) FROM {table.name}), 0), "
+            f"coalesce((SELECT max({id_column}) FROM {archive.name}), 0))"
+        ))
+    _search_triggers(conn)
+    _soft_delete_triggers(conn)
+
+
+def _updated_at_defaults(conn: Connection) -> None:
+    # Databases from before migration 1 kept updated_at without a default, so rows
+    # written without it read back as NULL. On SQLite migration 8 rebuilt the tables with
+    # the default already.
+    for table in ("projects_info", "tasks"):
+        if conn.dialect.name != "sqlite":
+            conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN updated_at SET DEFAULT now()"))
+        conn.execute(text(
+            f"UPDATE {table} SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP) WHERE updated_at IS NULL"
+        ))
+
+
+# Append only: a migration must never change once it has shipped.
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "baseline schema", _baseline),
+    (2, "project task count summary", _project_task_counts),
+    (3, "name search indexes", _search_indexes),
+    (4, "soft delete and archive tables", _soft_delete_and_archive),
+    (5, "idempotency keys", _idempotency_keys),
+    (6, "project members", _project_members),
+    (7, "archive surrogate keys", _archive_surrogate_keys),
+    (8, "sqlite autoincrement ids", _autoincrement_ids),
+    (9, "updated_at defaults", _updated_at_defaults),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def _current_version(conn: Connection) -> int:
+    if not inspect(conn).has_table(schema_version.name):
+        return 0
+    return conn.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+
+def _upgrade(conn: Connection, target: int) -> int:
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:lock_id)"), {"lock_id": MIGRATION_LOCK_ID})
+
+    schema_version.create(conn, checkfirst=True)
+    current = _current_version(conn)
+    for version, description, apply in MIGRATIONS:
+        if current < version <= target:
+            logger.info("Applying migration %s: %s", version, description)
+            apply(conn)
+            conn.execute(insert(schema_version).values(version=version, description=description))
+            current = version
+    return current
+
+
+async def upgrade(target: Optional[int] = None) -> int:
+    async with get_engine().begin() as conn:
+        return await conn.run_sync(_upgrade, LATEST_VERSION if target is None else target)
+
+
+async def current_version() -> int:
+    async with get_engine().connect() as conn:
+        return await conn.run_sync(_current_version)
+
+
+async def check_schema_version() -> None:
+    version = await current_version()
+    if version != LATEST_VERSION:
+        raise RuntimeError(
+            f"Database schema is at version {version} but this build expects {LATEST_VERSION}. "
+            "Run `python -m app.migrations upgrade` before starting the API."
+        )
+
+
+async def warm_up_pool(connections: int) -> None:
+    async def open_connection():
+        conn = await get_engine().connect().start()
+        await conn.exec_driver_sql("SELECT 1")
+        return conn
+
+    # Open them concurrently so the pool really holds `connections` distinct sockets.
+    opened = await asyncio.gather(*(open_connection() for _ in range(connections)), return_exceptions=True)
+    for conn in opened:
+        if not isinstance(conn, BaseException):
+            await conn.close()
+    for conn in opened:
+        if isinstance(conn, BaseException):
+            raise conn
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.migrations", description="Manage the database schema.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    upgrade_parser = commands.add_parser("upgrade", help="apply pending migrations")
+    upgrade_parser.add_argument("--to", type=int, default=None, help="stop at this version")
+    commands.add_parser("current", help="print the applied schema version")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    asyncio.run(_run_command(args))
+
+
+async def _run_command(args: argparse.Namespace) -> None:
+    try:
+        if args.command == "upgrade":
+            version = await upgrade(args.to)
+            print(f"Database schema is at version {version}.")
+        else:
+            version = await current_version()
+            print(f"Database schema is at version {version} (latest: {LATEST_VERSION}).")
+    finally:
+        await dispose_engines()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
-from sqlalchemy import Column, Enum, String, Integer, ForeignKey, DateTime, UUID
+from sqlalchemy import Column, Enum, String, Integer, ForeignKey, DateTime, Index, JSON, LargeBinary, Text, text
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.orm import relationship, declarative_base
 from sqlalchemy.sql import func
 from fastapi_users.db import SQLAlchemyBaseUserTableUUID
+from fastapi_users_db_sqlalchemy.generics import GUID
 import enum
 
 Base = declarative_base()
@@ -26,6 +28,15 @@ class User(SQLAlchemyBaseUserTableUUID, Base):
     tasks = relationship("Task", back_populates="assignee")
 
 
+# SQLite stores CURRENT_TIMESTAMP to the second and compares timestamps as text, so
+# Python values are bound the same way there; otherwise a keyset cursor taken from a
+# row sorts after the rows it ties with.
+Timestamp = DateTime(timezone=True).with_variant(
+    sqlite.DATETIME(storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"),
+    "sqlite",
+)
+
+
 class ProjectProcessStatus(enum.Enum):
     PENDING = "pending"
     IN_PROGRESS = "in_progress"
@@ -41,31 +52,160 @@ class ProjectPriority(enum.Enum):
 
 class Project(Base):
     __tablename__ = "projects_info"
+    __table_args__ = (
+        Index("ix_projects_info_created_at_project_id", "created_at", "project_id"),
+        Index("ix_projects_info_owner_id_created_at", "owner_id", "created_at"),
+        # Only soft-deleted rows are indexed; the archiver is the only reader.
+        Index(
+            "ix_projects_info_deleted_at",
+            "deleted_at",
+            postgresql_where=text("deleted_at IS NOT NULL"),
+            sqlite_where=text("deleted_at IS NOT NULL"),
+        ),
+        # Otherwise SQLite hands out max(rowid) + 1, reusing the id of an archived top row.
+        {"sqlite_autoincrement": True},
+    )
     
     project_id = Column(Integer, primary_key=True)
     project_name = Column(String, unique=True)
     project_status = Column(Enum(ProjectProcessStatus), nullable=False)
     project_priority = Column(Enum(ProjectPriority), nullable=False)
-    owner_id = Column(UUID, ForeignKey("users_base.id"))
+    owner_id = Column(GUID, ForeignKey("users_base.id"))
 
     
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    created_at = Column(Timestamp, server_default=func.now())
+    updated_at = Column(Timestamp, server_default=func.now(), onupdate=func.now())
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
     
-    owner = relationship("User", back_populates="projects")
-    tasks = relationship("Task", back_populates="project")
+    owner = relationship("User", back_populates="projects", lazy="raise")
+    tasks = relationship("Task", back_populates="project", lazy="raise")
 
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        Index("ix_tasks_project_id_created_at", "project_id", "created_at"),
+        Index("ix_tasks_assignee_id_updated_at", "assignee_id", "updated_at"),
+        Index(
+            "ix_tasks_deleted_at",
+            "deleted_at",
+            postgresql_where=text("deleted_at IS NOT NULL"),
+            sqlite_where=text("deleted_at IS NOT NULL"),
+        ),
+        {"sqlite_autoincrement": True},
+    )
     
     task_id = Column(Integer, primary_key=True)
     task_name = Column(String, unique=True)
     project_id = Column(Integer, ForeignKey("projects_info.project_id"))
-    assignee_id = Column(UUID, ForeignKey("users_base.id"))
+    assignee_id = Column(GUID, ForeignKey("users_base.id"))
     
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    created_at = Column(Timestamp, server_default=func.now())
+    updated_at = Column(Timestamp, server_default=func.now(), onupdate=func.now())
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
     
-    project = relationship("Project", back_populates="tasks")
-    assignee = relationship("User", back_populates="tasks")
+    project = relationship("Project", back_populates="tasks", lazy="raise")
+    assignee = relationship("User", back_populates="tasks", lazy="raise")
+
+
+# Task counts per (project, assignee), kept current by the task and project managers
+# so dashboards can read totals without scanning `tasks`. Unassigned tasks are
+# counted under UNASSIGNED because a primary key column cannot hold NULL.
+class ProjectTaskCount(Base):
+    __tablename__ = "project_task_counts"
+
+    project_id = Column(Integer, ForeignKey("projects_info.project_id", ondelete="CASCADE"), primary_key=True)
+    assignee_id = Column(GUID, primary_key=True)
+    task_count = Column(Integer, nullable=False, default=0)
+
+
+# Who belongs to which project: its owners and everyone assigned one of its tasks.
+# Rows are added by the managers when a project or task is given to someone and
+# removed when the user's last task or ownership there goes, so visibility checks
+# read this table instead of scanning tasks.
+class ProjectMember(Base):
+    __tablename__ = "project_members"
+    __table_args__ = (Index("ix_project_members_user_id_project_id", "user_id", "project_id"),)
+
+    project_id = Column(Integer, ForeignKey("projects_info.project_id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(GUID, ForeignKey("users_base.id", ondelete="CASCADE"), primary_key=True)
+
+
+# Cold storage for archived and soft-deleted projects and their tasks, moved out of
+# the hot tables by app.archive. No foreign keys, so users and projects can go away.
+# Keyed by archive_id: a project or task id can be archived twice if it was reused.
+class ArchivedProject(Base):
+    __tablename__ = "projects_archive"
+    __table_args__ = (Index("ix_projects_archive_archived_at", "archived_at"),)
+
+    archive_id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, nullable=False)
+    project_name = Column(String)
+    project_status = Column(Enum(ProjectProcessStatus), nullable=False)
+    project_priority = Column(Enum(ProjectPriority), nullable=False)
+    owner_id = Column(GUID)
+
+    created_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True))
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ArchivedTask(Base):
+    __tablename__ = "tasks_archive"
+    __table_args__ = (
+        Index("ix_tasks_archive_project_id", "project_id"),
+        Index("ix_tasks_archive_archived_at", "archived_at"),
+    )
+
+    archive_id = Column(Integer, primary_key=True)
+    task_id = Column(Integer, nullable=False)
+    task_name = Column(String)
+    project_id = Column(Integer)
+    assignee_id = Column(GUID)
+
+    created_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True))
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+# Responses to writes sent with an Idempotency-Key, replayed when the client retries.
+# status_code is NULL while the first request is still running.
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (Index("ix_idempotency_keys_expires_at", "expires_at"),)
+
+    user_id = Column(GUID, primary_key=True)
+    key = Column(String(255), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=True)
+    body = Column(LargeBinary, nullable=True)
+    headers = Column(JSON, nullable=True)
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class EmailStatus(enum.Enum):
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+
+
+class OutboundEmail(Base):
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    email_id = Column(Integer, primary_key=True)
+    subject = Column(String, nullable=False)
+    recipients = Column(JSON, nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(Enum(EmailStatus), nullable=False, default=EmailStatus.PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String, nullable=True)
+
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
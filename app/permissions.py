@@ -0,0 +1,118 @@
+import uuid
+from typing import Iterable, Optional, Set, Tuple
+
+from sqlalchemy import delete, exists, true, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.models import Project, ProjectMember, ProjectTaskCount, Task, User, UserStatus
+
+# Who sees what, by UserStatus (superusers count as COMPANY_OWNER):
+#   COMPANY_OWNER, PROJECT_DIRECTOR  every project and task
+#   LEADER_OF_PROJECT                projects they are a member of, with all of their tasks
+#   SIMPLE_USER                      projects they are a member of, and only their own tasks
+# Below PROJECT_DIRECTOR only a project's owner may change it; tasks may be changed by
+# anyone who can see them. Each rule is a SQL expression for the managers' WHERE clauses,
+# so rows a user may not see are never loaded.
+FULL_ACCESS = frozenset({UserStatus.COMPANY_OWNER, UserStatus.PROJECT_DIRECTOR})
+
+
+def has_full_access(user: User) -> bool:
+    return user.is_superuser or user.user_status in FULL_ACCESS
+
+
+def sees_project_tasks(user: User) -> bool:
+    # Whether the user sees every task of the projects visible to them.
+    return has_full_access(user) or user.user_status == UserStatus.LEADER_OF_PROJECT
+
+
+def member_project_ids(user: User):
+    # Served from ix_project_members_user_id_project_id alone.
+    return select(ProjectMember.project_id).where(ProjectMember.user_id == user.id)
+
+
+def project_visibility(user: User, project_id=Project.project_id):
+    if has_full_access(user):
+        return true()
+    return project_id.in_(member_project_ids(user))
+
+
+def project_write_access(user: User):
+    if has_full_access(user):
+        return true()
+    return Project.owner_id == user.id
+
+
+def task_visibility(user: User, project_id=Task.project_id, assignee_id=Task.assignee_id):
+    # The columns can be swapped for any table keyed by (project, assignee), e.g. task counts.
+    if sees_project_tasks(user):
+        return project_visibility(user, project_id)
+    return assignee_id == user.id
+
+
+async def visible_project_ids(session: AsyncSession, user: User) -> Optional[Set[int]]:
+    # None means every project.
+    if has_full_access(user):
+        return None
+    result = await session.scalars(member_project_ids(user))
+    return set(result.all())
+
+
+async def can_view_project(session: AsyncSession, user: User, project_id: int) -> bool:
+    if has_full_access(user):
+        return True
+    member = await session.scalar(
+        select(ProjectMember.project_id).where(ProjectMember.project_id == project_id, ProjectMember.user_id == user.id)
+    )
+    return member is not None
+
+
+async def can_view_task(
+    session: AsyncSession, user: User, project_id: Optional[int], assignee_id: Optional[uuid.UUID]
+) -> bool:
+    if not sees_project_tasks(user):
+        return assignee_id == user.id
+    return project_id is not None and await can_view_project(session, user, project_id)
+
+
+def member_insert(dialect_name: str):
+    dialect_insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    return dialect_insert(ProjectMember).on_conflict_do_nothing()
+
+
+async def add_project_members(session: AsyncSession, members: Iterable[Tuple[Optional[int], Optional[uuid.UUID]]]) -> None:
+    # Runs inside the caller's transaction, next to the write that made the assignment.
+    params = [
+        {"project_id": project_id, "user_id": user_id}
+        for project_id, user_id in set(members)
+        if project_id is not None and user_id is not None
+    ]
+    if params:
+        await session.execute(member_insert(session.bind.dialect.name), params)
+
+
+async def remove_project_members(
+    session: AsyncSession, members: Iterable[Tuple[Optional[int], Optional[uuid.UUID]]]
+) -> None:
+    # For (project, user) pairs that just lost a task or their ownership. A pair is kept
+    # while the user still owns the project or has another live task in it; the task
+    # counts must already include the caller's changes.
+    pairs = {(project_id, user_id) for project_id, user_id in members if project_id is not None and user_id is not None}
+    if not pairs:
+        return
+    owns_project = select(Project.project_id).where(
+        Project.project_id == ProjectMember.project_id, Project.owner_id == ProjectMember.user_id
+    )
+    has_tasks = select(ProjectTaskCount.project_id).where(
+        ProjectTaskCount.project_id == ProjectMember.project_id,
+        ProjectTaskCount.assignee_id == ProjectMember.user_id,
+        ProjectTaskCount.task_count > 0,
+    )
+    await session.execute(
+        delete(ProjectMember).where(
+            tuple_(ProjectMember.project_id, ProjectMember.user_id).in_(pairs),
+            ~exists(owns_project),
+            ~exists(has_tasks),
+        )
+    )
@@ -1,19 +1,82 @@
+import uuid
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, insert, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from fastapi import HTTPException, status, Depends
+from fastapi import HTTPException, Query, status, Depends
+from sqlalchemy.orm import joinedload, selectinload
 
-from app.db import get_async_session
-from app.models import Project, User
+from app.db import get_async_session, read_session_maker
+from app.events import event_bus, project_event
+from app.models import Project, ProjectPriority, ProjectProcessStatus, ProjectTaskCount, Task, User
+from app.permissions import (
+    add_project_members,
+    can_view_project,
+    project_visibility,
+    project_write_access,
+    remove_project_members,
+    task_visibility,
+)
+from app.pagination import DEFAULT_PAGE_SIZE, STREAM_BATCH_SIZE, apply_keyset, split_page
+from app.response_cache import response_cache
 from app.schemas import ProjectCreate, ProjectUpdate
 from app.auth import current_active_user 
 
+# Relationship name -> eager-loading strategy. Collections use a second SELECT ... IN
+# query, limited to the rows the user may see; the many-to-one owner is joined into
+# the main query.
+PROJECT_INCLUDES = {
+    "tasks": lambda user: selectinload(Project.tasks.and_(Task.deleted_at.is_(None), task_visibility(user))),
+    "owner": lambda user: joinedload(Project.owner),
+}
+
+
+def parse_project_includes(
+    include: Optional[str] = Query(None, description="Comma-separated relationships to embed: tasks, owner."),
+) -> Tuple[str, ...]:
+    if not include:
+        return ()
+    names = tuple(dict.fromkeys(name.strip() for name in include.split(",") if name.strip()))
+    unknown = [name for name in names if name not in PROJECT_INCLUDES]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown include: {', '.join(unknown)}. Allowed: {', '.join(PROJECT_INCLUDES)}.",
+        )
+    return names
+
+
+def _include_options(include: Sequence[str], user: User):
+    return [PROJECT_INCLUDES[name](user) for name in include]
+
+
+def project_filters(
+    project_status: Optional[ProjectProcessStatus] = None,
+    project_priority: Optional[ProjectPriority] = None,
+    owner_id: Optional[uuid.UUID] = None,
+) -> list:
+    conditions = [Project.deleted_at.is_(None)]
+    if project_status is not None:
+        conditions.append(Project.project_status == project_status)
+    if project_priority is not None:
+        conditions.append(Project.project_priority == project_priority)
+    if owner_id is not None:
+        conditions.append(Project.owner_id == owner_id)
+    return conditions
+
+
 class ProjectManager:
     def __init__(self, session: AsyncSession = Depends(get_async_session)):
         self.session = session
         
-    async def get_project(self, project_id: int):
+    async def get_project(self, project_id: int, user: User, include: Sequence[str] = ()):
         result = await self.session.execute(
-            select(Project).where(Project.project_id == project_id)
+            select(Project)
+            .where(Project.project_id == project_id, Project.deleted_at.is_(None), project_visibility(user))
+            .options(*_include_options(include, user))
         )
         project = result.scalars().first()
         if not project:
@@ -22,36 +85,136 @@ class ProjectManager:
                 detail=f"Project with ID {project_id} not found."
             )
         return project
+
+    async def can_view(self, project_id: int, user: User) -> bool:
+        return await can_view_project(self.session, user, project_id)
+
+    async def _raise_missing_or_forbidden(self, project_id: int, user: User):
+        # Only reached when a write-scoped statement matched no row.
+        exists = await self.session.scalar(
+            select(Project.project_id).where(
+                Project.project_id == project_id, Project.deleted_at.is_(None), project_visibility(user)
+            )
+        )
+        if exists is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Project with ID {project_id} not found."
+            )
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only the project owner can change this project.",
+        )
+
+    async def _raise_name_taken(self):
+        # Names are unique across live and soft-deleted projects until the latter are archived.
+        await self.session.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Project name already exists.")
+
+    def _filtered_projects(self, user: User, include: Sequence[str] = (), **filters):
+        return (
+            select(Project)
+            .options(*_include_options(include, user))
+            .where(*project_filters(**filters), project_visibility(user))
+        )
+
+    async def list_projects(
+        self,
+        user: User,
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        **filters,
+    ) -> Tuple[List[Project], Optional[str]]:
+        query = apply_keyset(
+            self._filtered_projects(user, **filters), Project.created_at, Project.project_id, cursor, limit
+        )
+        result = await self.session.execute(query)
+        return split_page(result.scalars().unique().all(), "created_at", "project_id", limit)
+
+    async def stream_projects(self, user: User, cursor: Optional[str] = None, **filters) -> AsyncIterator[Project]:
+        query = apply_keyset(
+            self._filtered_projects(user, **filters), Project.created_at, Project.project_id, cursor, None
+        )
+        # The response body is produced after the request-scoped session is released,
+        # so the server-side cursor gets a session of its own.
+        async with read_session_maker() as session:
+            result = await session.stream(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+            async for project in result.scalars():
+                yield project
     
     async def create_project(self, project_data: ProjectCreate, user: User = Depends(current_active_user)):
-        new_project = Project(
-            **project_data.model_dump(),
-            owner_id=user.id
-        )
-        self.session.add(new_project)
+        values = {**project_data.model_dump(), "owner_id": user.id}
+        try:
+            project = await self.session.scalar(insert(Project).values(**values).returning(Project))
+        except IntegrityError:
+            await self._raise_name_taken()
+        await add_project_members(self.session, [(project.project_id, user.id)])
         await self.session.commit()
-        await self.session.refresh(new_project)
-        return new_project
+        await event_bus.publish(project_event("created", project.project_id, project))
+        return project
     
-    async def update_project(self, project_id: int, project_update: ProjectUpdate):
-        project = await self.get_project(project_id)
-        for key, value in project_update.model_dump(exclude_unset=True).items():
-            setattr(project, key, value)
-        self.session.add(project)
+    async def update_project(self, project_id: int, project_update: ProjectUpdate, user: User):
+        values = project_update.model_dump(exclude_unset=True)
+        if not values:
+            return await self.get_project(project_id, user)
+
+        previous_owner_id = None
+        if "owner_id" in values:
+            previous_owner_id = await self.session.scalar(
+                select(Project.owner_id).where(Project.project_id == project_id)
+            )
+        try:
+            project = await self.session.scalar(
+                update(Project)
+                .where(Project.project_id == project_id, Project.deleted_at.is_(None), project_write_access(user))
+                .values(**values)
+                .returning(Project)
+                .execution_options(populate_existing=True)
+            )
+        except IntegrityError:
+            await self._raise_name_taken()
+        if project is None:
+            await self._raise_missing_or_forbidden(project_id, user)
+        await add_project_members(self.session, [(project_id, project.owner_id)])
+        if previous_owner_id != project.owner_id:
+            await remove_project_members(self.session, [(project_id, previous_owner_id)])
         await self.session.commit()
-        await self.session.refresh(project)
-        return project      
+        response_cache.evict("project", project_id)
+        await event_bus.publish(project_event("updated", project_id, project))
+        return project
     
-    async def delete_project(self, project_id: int):
-        project = await self.get_project(project_id)
-        await self.session.delete(project)
+    async def delete_project(self, project_id: int, user: User):
+        # Soft delete: the project and its tasks disappear from every query now and are
+        # moved to the archive tables by app.archive once the retention period passes.
+        now = datetime.now(timezone.utc)
+        deleted_id = await self.session.scalar(
+            update(Project)
+            .where(Project.project_id == project_id, Project.deleted_at.is_(None), project_write_access(user))
+            .values(deleted_at=now)
+            .returning(Project.project_id)
+        )
+        if deleted_id is None:
+            await self._raise_missing_or_forbidden(project_id, user)
+        task_ids = await self.session.scalars(
+            update(Task)
+            .where(Task.project_id == project_id, Task.deleted_at.is_(None))
+            .values(deleted_at=now)
+            .returning(Task.task_id)
+        )
+        task_ids = task_ids.all()
+        await self.session.execute(delete(ProjectTaskCount).where(ProjectTaskCount.project_id == project_id))
         await self.session.commit()
+        response_cache.evict("project", project_id)
+        response_cache.evict("task", *task_ids)
+        await event_bus.publish(project_event("deleted", project_id))
         
 async def get_project_manager(session: AsyncSession = Depends(get_async_session)):
     return ProjectManager(session)
 
 async def current_active_project(
     project_id: int,
+    include: Tuple[str, ...] = Depends(parse_project_includes),
+    user: User = Depends(current_active_user),
     project_manager: ProjectManager = Depends(get_project_manager),
 ):
-    return await project_manager.get_project(project_id)
+    return await project_manager.get_project(project_id, user, include)
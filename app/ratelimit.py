@@ -0,0 +1,222 @@
+import asyncio
+import math
+import time
+from typing import Callable, Dict, Optional, Protocol, Tuple
+
+from fastapi import Depends, HTTPException, Request, status
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.auth import fastapi_users
+from app.cache import TTLCache
+from app.config import SettingsBound, settings
+from app.models import User
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+optional_active_user = fastapi_users.current_user(active=True, optional=True)
+
+
+def parse_rate(rate: str) -> Tuple[int, float]:
+    # "5/minute" -> (5 requests, 60 seconds)
+    count, _, period = rate.partition("/")
+    try:
+        return int(count), PERIODS[period.strip().rstrip("s")]
+    except (KeyError, ValueError):
+        raise ValueError(f"Invalid rate {rate!r}; expected e.g. '5/minute'")
+
+
+class RateLimitBackend(Protocol):
+    # Takes one token from the bucket at `key` and returns 0 when allowed, otherwise
+    # the seconds until a token is available. Async so a shared store can back it.
+    async def acquire(self, key: str, capacity: int, period: float) -> float: ...
+
+
+class InMemoryRateLimitBackend:
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: Dict[float, TTLCache] = {}
+
+    def _bucket_cache(self, period: float) -> TTLCache:
+        # An idle bucket refills completely within one period, so it can be forgotten.
+        cache = self._buckets.get(period)
+        if cache is None:
+            cache = self._buckets[period] = TTLCache(max_size=self.max_keys, ttl_seconds=period)
+        return cache
+
+    async def acquire(self, key: str, capacity: int, period: float) -> float:
+        cache = self._bucket_cache(period)
+        now = time.monotonic()
+        refill_rate = capacity / period
+        tokens, updated_at = cache.get(key, (float(capacity), now))
+        tokens = min(capacity, tokens + (now - updated_at) * refill_rate)
+        if tokens >= 1:
+            cache.set(key, (tokens - 1, now))
+            return 0.0
+        cache.set(key, (tokens, now))
+        return (1 - tokens) / refill_rate
+
+
+def _client_ip(request: Request) -> str:
+    # Behind a proxy, run uvicorn with --proxy-headers so this is the real client.
+    return request.client.host if request.client else "unknown"
+
+
+async def _request_email(request: Request) -> Optional[str]:
+    email = request.query_params.get("email")
+    if email is None:
+        content_type = request.headers.get("content-type", "")
+        if content_type.startswith(("application/x-www-form-urlencoded", "multipart/form-data")):
+            form = await request.form()
+            email = form.get("username") or form.get("email")
+        elif content_type.startswith("application/json"):
+            try:
+                body = await request.json()
+            except ValueError:
+                body = None
+            if isinstance(body, dict):
+                email = body.get("email")
+    return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+
+class RateLimiter:
+    def __init__(self, backend: RateLimitBackend, enabled: bool = True):
+        self.backend = backend
+        self.enabled = enabled
+        self.rejected: Dict[str, int] = {}
+
+    async def check(self, policy: str, key: str, rate: str) -> None:
+        if not self.enabled:
+            return
+        capacity, period = parse_rate(rate)
+        retry_after = await self.backend.acquire(f"{policy}:{key}", capacity, period)
+        if retry_after > 0:
+            self.rejected[policy] = self.rejected.get(policy, 0) + 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests. Try again later.",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.rejected)
+
+
+rate_limiter = SettingsBound(
+    lambda config: RateLimiter(
+        InMemoryRateLimitBackend(max_keys=config.rate_limit_max_keys),
+        enabled=config.rate_limit_enabled,
+    )
+)
+
+
+def rate_limit(policy: str, rate_setting: str, key: str = "ip") -> Callable:
+    # Route dependency: key="ip", "user" (falls back to IP when anonymous) or "email"
+    # (the login form username, ?email= or a JSON body's email; skipped when absent).
+    # The rate is the named setting, read per request so it follows configure().
+    parse_rate(getattr(settings, rate_setting))
+
+    if key == "ip":
+        async def limit_by_ip(request: Request):
+            await rate_limiter.check(policy, _client_ip(request), getattr(settings, rate_setting))
+        return limit_by_ip
+
+    if key == "user":
+        async def limit_by_user(request: Request, user: Optional[User] = Depends(optional_active_user)):
+            key_value = str(user.id) if user else _client_ip(request)
+            await rate_limiter.check(policy, key_value, getattr(settings, rate_setting))
+        return limit_by_user
+
+    if key == "email":
+        async def limit_by_email(request: Request):
+            email = await _request_email(request)
+            if email is not None:
+                await rate_limiter.check(policy, email, getattr(settings, rate_setting))
+        return limit_by_email
+
+    raise ValueError(f"Unknown rate limit key {key!r}")
+
+
+write_rate_limit = rate_limit("writes", "rate_limit_writes", "user")
+
+
+class AdmissionController:
+    # Caps concurrently handled requests. Excess requests wait briefly for a slot and
+    # are shed once the wait queue is full or the wait times out, so overload is
+    # refused up front instead of piling onto the event loop and DB pool.
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(max_concurrency) if max_concurrency > 0 else None
+        self.waiting = 0
+        self.active = 0
+        self.shed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._slots is not None
+
+    async def admit(self) -> bool:
+        if self._slots.locked():
+            if self.waiting >= self.max_queue:
+                self.shed += 1
+                return False
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.shed += 1
+                return False
+            finally:
+                self.waiting -= 1
+        else:
+            await self._slots.acquire()
+        self.active += 1
+        return True
+
+    def release(self) -> None:
+        self.active -= 1
+        self._slots.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self.active,
+            "waiting": self.waiting,
+            "shed": self.shed,
+        }
+
+
+admission_controller = SettingsBound(
+    lambda config: AdmissionController(
+        max_concurrency=config.admission_max_concurrency,
+        max_queue=config.admission_max_queue,
+        queue_timeout=config.admission_queue_timeout_seconds,
+    )
+)
+
+
+class AdmissionControlMiddleware:
+    def __init__(self, app: ASGIApp, controller: AdmissionController, exempt_prefixes: Tuple[str, ...] = ()):
+        self.app = app
+        self.controller = controller
+        self.exempt_prefixes = exempt_prefixes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not self.controller.enabled or scope["type"] != "http" or scope["path"].startswith(self.exempt_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        if not await self.controller.admit():
+            response = JSONResponse(
+                {"detail": "Server is busy. Try again shortly."},
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": "1"},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
@@ -0,0 +1,127 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Hashable, Optional, Protocol
+
+from fastapi import Request, Response, status
+
+from app.cache import TTLCache
+from app.config import SettingsBound
+
+
+class CachedResponse:
+    __slots__ = ("body", "etag", "last_modified", "meta")
+
+    def __init__(self, body: bytes, last_modified: Optional[datetime], meta: Optional[Dict[str, Any]] = None):
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        self.last_modified = last_modified
+        self.meta = meta or {}
+
+
+class ResponseCacheBackend(Protocol):
+    def get(self, key: Hashable) -> Optional[Dict[str, CachedResponse]]: ...
+
+    def set(self, key: Hashable, variants: Dict[str, CachedResponse]) -> None: ...
+
+    def delete(self, key: Hashable) -> None: ...
+
+    def delete_resource(self, resource: str) -> None: ...
+
+
+class InMemoryResponseCacheBackend:
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self._cache = TTLCache(max_size=max_entries, ttl_seconds=ttl_seconds)
+
+    def get(self, key: Hashable) -> Optional[Dict[str, CachedResponse]]:
+        return self._cache.get(key)
+
+    def set(self, key: Hashable, variants: Dict[str, CachedResponse]) -> None:
+        self._cache.set(key, variants)
+
+    def delete(self, key: Hashable) -> None:
+        self._cache.pop(key)
+
+    def delete_resource(self, resource: str) -> None:
+        for key in [key for key in self._cache.keys() if key[0] == resource]:
+            self._cache.pop(key)
+
+    def stats(self) -> Dict[str, int]:
+        return self._cache.stats()
+
+
+# Serialized single-resource responses keyed by (resource, id); each entry holds one
+# body per representation variant (e.g. the `include` set). Managers evict on write.
+class ResponseCache:
+    def __init__(self, backend: ResponseCacheBackend):
+        self.backend = backend
+
+    def lookup(self, resource: str, resource_id: Any, variant: str = "") -> Optional[CachedResponse]:
+        variants = self.backend.get((resource, resource_id))
+        if variants is None:
+            return None
+        return variants.get(variant)
+
+    def store(
+        self,
+        resource: str,
+        resource_id: Any,
+        variant: str,
+        body: bytes,
+        last_modified: Optional[datetime],
+        **meta,
+    ) -> CachedResponse:
+        entry = CachedResponse(body, last_modified, meta)
+        variants = self.backend.get((resource, resource_id)) or {}
+        variants[variant] = entry
+        self.backend.set((resource, resource_id), variants)
+        return entry
+
+    def evict(self, resource: str, *resource_ids: Any) -> None:
+        for resource_id in resource_ids:
+            if resource_id is not None:
+                self.backend.delete((resource, resource_id))
+
+    def evict_resource(self, resource: str) -> None:
+        self.backend.delete_resource(resource)
+
+
+response_cache = SettingsBound(
+    lambda config: ResponseCache(
+        InMemoryResponseCacheBackend(
+            max_entries=config.response_cache_max_entries,
+            ttl_seconds=config.response_cache_ttl_seconds,
+        )
+    )
+)
+
+
+def _not_modified(request: Request, entry: CachedResponse) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or entry.etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and entry.last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        # HTTP dates have whole-second precision.
+        return _as_utc(entry.last_modified).replace(microsecond=0) <= _as_utc(since)
+    return False
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def cached_json_response(request: Request, entry: CachedResponse) -> Response:
+    headers = {"ETag": entry.etag, "Cache-Control": "private, no-cache"}
+    if entry.last_modified is not None:
+        headers["Last-Modified"] = format_datetime(_as_utc(entry.last_modified), usegmt=True)
+
+    if _not_modified(request, entry):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
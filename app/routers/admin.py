@@ -0,0 +1,19 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, Query
+
+from app.archive import archiver
+from app.auth import current_superuser
+from app.schemas import ArchiveResult
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(current_superuser)])
+
+@router.post("/archive", response_model=ArchiveResult)
+async def run_archival():
+    return await archiver.archive()
+
+@router.delete("/archive", response_model=ArchiveResult)
+async def purge_archive(
+    before: datetime = Query(..., description="Permanently delete rows archived before this time."),
+):
+    return await archiver.purge(before)
@@ -1,39 +1,50 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import EmailStr
 from app.auth import auth_backend, fastapi_users, current_active_user, create_access_token
-from app.schemas import UserRead, UserUpdate
+from app.schemas import UserCreate, UserRead, UserUpdate
 from app.config import settings
-from app.utils import send_email
+from app.mailer import enqueue_email
 from app.models import User
 from app.auth import get_user_manager
+from app.ratelimit import rate_limit
 from datetime import timedelta
 
 router = APIRouter()
 
+# Login costs a bcrypt verification; registration a hash plus an email; the reset and
+# verify routes send email. Each is limited per client IP and, where known, per address.
+LOGIN_LIMITS = [
+    Depends(rate_limit("login-ip", "rate_limit_login", "ip")),
+    Depends(rate_limit("login-email", "rate_limit_login_email", "email")),
+]
+REGISTER_LIMITS = [Depends(rate_limit("register-ip", "rate_limit_register", "ip"))]
+EMAIL_LIMITS = [
+    Depends(rate_limit("email-ip", "rate_limit_email_ip", "ip")),
+    Depends(rate_limit("email-address", "rate_limit_email_address", "email")),
+]
 
-router.include_router(fastapi_users.get_auth_router(auth_backend), prefix="/auth/jwt", tags=["auth"])
-router.include_router(fastapi_users.get_register_router(UserRead, UserUpdate), prefix="/auth", tags=["auth"])
-router.include_router(fastapi_users.get_reset_password_router(), prefix="/auth", tags=["auth"])
-router.include_router(fastapi_users.get_verify_router(UserRead), prefix="/auth", tags=["auth"])
+router.include_router(fastapi_users.get_auth_router(auth_backend), prefix="/auth/jwt", tags=["auth"], dependencies=LOGIN_LIMITS)
+router.include_router(fastapi_users.get_register_router(UserRead, UserCreate), prefix="/auth", tags=["auth"], dependencies=REGISTER_LIMITS)
+router.include_router(fastapi_users.get_reset_password_router(), prefix="/auth", tags=["auth"], dependencies=EMAIL_LIMITS)
+router.include_router(fastapi_users.get_verify_router(UserRead), prefix="/auth", tags=["auth"], dependencies=EMAIL_LIMITS)
 
 
 router.include_router(fastapi_users.get_users_router(UserRead, UserUpdate), prefix="/users", tags=["users"])
 
-@router.post("/auth/jwt/login", tags=["auth"])
+@router.post("/auth/jwt/login", tags=["auth"], dependencies=LOGIN_LIMITS)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(), 
-    background_tasks: BackgroundTasks = None, 
     user_manager = Depends(get_user_manager)
 ):
-    user = await user_manager.authenticate(request=None, form_data=form_data)
+    user = await user_manager.authenticate(form_data)
     if not user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Incorrect username or password")
     
     token = create_access_token(data={"sub": str(user.id)})
     
-    background_tasks.add_task(
-        send_email,
+    await enqueue_email(
+        user_manager.user_db.session,
         subject="Welcome!",
         recipients=[user.email],
         body=f"Welcome to our service, {user.full_name}!",
@@ -41,10 +52,9 @@ async def login(
     
     return {"access_token": token, "token_type": "bearer"}
 
-@router.post("/auth/request-reset-password", tags=["auth"])
+@router.post("/auth/request-reset-password", tags=["auth"], dependencies=EMAIL_LIMITS)
 async def request_reset_password(
     email: EmailStr, 
-    background_tasks: BackgroundTasks, 
     user_manager = Depends(get_user_manager)
 ):
     user = await user_manager.get_by_email(email)
@@ -54,8 +64,8 @@ async def request_reset_password(
     token = create_access_token(data={"sub": str(user.id)}, expires_delta=timedelta(hours=1))
     
     reset_url = f"{settings.frontend_url}/reset-password?token={token}"
-    background_tasks.add_task(
-        send_email,
+    await enqueue_email(
+        user_manager.user_db.session,
         subject="Reset Your Password",
         recipients=[user.email],
         body=f"Please click the following link to reset your password: {reset_url}",
@@ -0,0 +1,102 @@
+import asyncio
+from typing import AsyncIterator, Mapping, Optional, Set
+
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketException, status
+from fastapi.responses import StreamingResponse
+
+from app.auth import User, authenticate_token
+from app.config import settings
+from app.db import read_session_maker
+from app.events import Subscription, event_bus
+from app.permissions import visible_project_ids
+
+router = APIRouter()
+
+RESYNC_REASON = "Subscriber fell behind; refetch and reconnect."
+
+PROJECTS_QUERY = Query(None, description="Comma-separated project ids to limit the feed to.")
+TOKEN_QUERY = Query(None, description="Access token, for clients that cannot set the Authorization header.")
+
+
+def _parse_project_ids(projects: Optional[str]) -> Set[int]:
+    if not projects:
+        return set()
+    return {int(project_id) for project_id in projects.split(",") if project_id.strip()}
+
+
+def _bearer_token(headers: Mapping[str, str]) -> Optional[str]:
+    scheme, _, credentials = headers.get("authorization", "").partition(" ")
+    return credentials if scheme.lower() == "bearer" and credentials else None
+
+
+async def _subscribe(user: User, project_ids: Set[int]) -> Subscription:
+    async with read_session_maker() as session:
+        member_project_ids = await visible_project_ids(session, user)
+    return event_bus.subscribe(user, project_ids, member_project_ids)
+
+
+async def _send_events(websocket: WebSocket, subscription: Subscription):
+    while True:
+        event = await subscription.get()
+        if event is None:
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason=RESYNC_REASON)
+            return
+        await websocket.send_text(event.model_dump_json())
+
+
+@router.websocket("/events/ws")
+async def change_feed_ws(websocket: WebSocket, token: Optional[str] = TOKEN_QUERY, projects: Optional[str] = PROJECTS_QUERY):
+    user = await authenticate_token(token or _bearer_token(websocket.headers))
+    if user is None:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Not authenticated")
+    try:
+        project_ids = _parse_project_ids(projects)
+    except ValueError:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Invalid project id")
+
+    await websocket.accept()
+    subscription = await _subscribe(user, project_ids)
+    sender = asyncio.create_task(_send_events(websocket, subscription))
+    try:
+        # The feed is one-way; reading only notices the client going away.
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+    finally:
+        event_bus.unsubscribe(subscription)
+        sender.cancel()
+        await asyncio.gather(sender, return_exceptions=True)
+
+
+async def _sse_events(subscription: Subscription) -> AsyncIterator[str]:
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                event = await subscription.get(timeout=settings.events_heartbeat_seconds)
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle stream.
+                yield ": keep-alive\n\n"
+                continue
+            if event is None:
+                yield f"event: resync\ndata: {RESYNC_REASON}\n\n"
+                return
+            yield f"event: {event.resource}.{event.action}\ndata: {event.model_dump_json()}\n\n"
+    finally:
+        event_bus.unsubscribe(subscription)
+
+
+@router.get("/events/stream", tags=["events"])
+async def change_feed_sse(request: Request, token: Optional[str] = TOKEN_QUERY, projects: Optional[str] = PROJECTS_QUERY):
+    user = await authenticate_token(token or _bearer_token(request.headers))
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    try:
+        project_ids = _parse_project_ids(projects)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid project id")
+
+    return StreamingResponse(
+        _sse_events(await _subscribe(user, project_ids)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Request, Response, status
+
+router = APIRouter()
+
+@router.get("/health/live", tags=["health"])
+async def liveness():
+    return {"status": "alive"}
+
+@router.get("/health/ready", tags=["health"])
+async def readiness(request: Request, response: Response):
+    if not getattr(request.app.state, "ready", False):
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return {"status": "starting"}
+    return {"status": "ready"}
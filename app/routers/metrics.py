@@ -0,0 +1,25 @@
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+
+from app.config import settings
+from app.metrics import PROMETHEUS_MEDIA_TYPE, metrics
+
+router = APIRouter()
+
+def require_metrics_token(authorization: Optional[str] = Header(None)):
+    token = settings.metrics_token
+    if token is None:
+        return
+    scheme, _, credentials = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(credentials.encode(), token.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+@router.get("/metrics", include_in_schema=False, dependencies=[Depends(require_metrics_token)])
+async def prometheus_metrics():
+    return Response(content=metrics.render(), media_type=PROMETHEUS_MEDIA_TYPE)
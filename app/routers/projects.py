@@ -1,25 +1,58 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.future import select
-from sqlalchemy.ext.asyncio import AsyncSession
-from app.projects import ProjectManager, get_project_manager, current_active_project
-from app.models import Project
-from app.schemas import ProjectCreate, ProjectRead, ProjectUpdate
-from app.auth import current_active_user
-from typing import List
-
-router = APIRouter()
-
-@router.get("/projects", response_model=List[ProjectRead], tags=["projects"])
+import uuid
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.responses import StreamingResponse
+from app.projects import ProjectManager, get_project_manager, parse_project_includes
+from app.models import ProjectPriority, ProjectProcessStatus
+from app.response_cache import cached_json_response, response_cache
+from app.ratelimit import write_rate_limit
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER
+from app.schemas import ImportResult, ProjectCreate, ProjectDetail, ProjectRead, ProjectStats, ProjectUpdate
+from app.stats import StatsManager, get_stats_manager
+from app.auth import User, current_active_user, current_superuser
+from app.idempotency import IdempotentRoute
+from app.permissions import sees_project_tasks
+from app.transfer import MEDIA_TYPES, TransferFormat, TransferManager, get_transfer_manager
+from app.utils import NDJSON_MEDIA_TYPE, iter_ndjson, json_list_response
+from typing import List, Optional, Tuple
+
+router = APIRouter(route_class=IdempotentRoute)
+
+@router.get("/projects", response_model=List[ProjectDetail], response_model_exclude_unset=True, tags=["projects"])
 async def list_projects(
-    session: AsyncSession = Depends(get_project_manager)
+    project_status: Optional[ProjectProcessStatus] = None,
+    project_priority: Optional[ProjectPriority] = None,
+    owner_id: Optional[uuid.UUID] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    stream: bool = Query(False, description="Stream every matching project as NDJSON instead of a single page."),
+    include: Tuple[str, ...] = Depends(parse_project_includes),
+    user: User = Depends(current_active_user),
+    project_manager: ProjectManager = Depends(get_project_manager),
 ):
-    result = await session.execute(select(Project))
-    projects = result.scalars().all()
-    if not projects:
+    filters = {
+        "project_status": project_status,
+        "project_priority": project_priority,
+        "owner_id": owner_id,
+        "include": include,
+    }
+    if stream:
+        return StreamingResponse(
+            iter_ndjson(
+                project_manager.stream_projects(user, cursor=cursor, **filters), ProjectDetail, exclude_unset=True
+            ),
+            media_type=NDJSON_MEDIA_TYPE,
+        )
+
+    projects, next_cursor = await project_manager.list_projects(user, cursor=cursor, limit=limit, **filters)
+    # A cursor past the last row is an empty page, not a missing resource.
+    if not projects and cursor is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No projects found.")
-    return projects
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor is not None else None
+    if not include:
+        return json_list_response(projects, ProjectRead, headers)
+    return json_list_response(projects, ProjectDetail, headers, exclude_unset=True)
 
-@router.post("/projects", response_model=ProjectRead, tags=["projects"])
+@router.post("/projects", response_model=ProjectRead, tags=["projects"], dependencies=[Depends(write_rate_limit)])
 async def create_project(
     project_data: ProjectCreate,
     user=Depends(current_active_user),
@@ -27,25 +60,83 @@ async def create_project(
 ):
     return await project_manager.create_project(project_data, user)
 
-@router.get("/projects/{project_id}", response_model=ProjectRead, tags=["projects"])
+# Declared before /projects/{project_id} so "stats" and "export" are not parsed as ids.
+@router.get("/projects/stats", response_model=ProjectStats, tags=["projects"])
+async def project_stats(
+    response: Response,
+    project_status: Optional[ProjectProcessStatus] = None,
+    project_priority: Optional[ProjectPriority] = None,
+    owner_id: Optional[uuid.UUID] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    user: User = Depends(current_active_user),
+    stats_manager: StatsManager = Depends(get_stats_manager),
+):
+    # Totals cover every matching project; `projects` is one page, continued via X-Next-Cursor.
+    stats, next_cursor = await stats_manager.project_stats(
+        user,
+        cursor=cursor,
+        limit=limit,
+        project_status=project_status,
+        project_priority=project_priority,
+        owner_id=owner_id,
+    )
+    if next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return stats
+
+@router.get("/projects/export", tags=["projects"], dependencies=[Depends(current_superuser)])
+async def export_projects(
+    fmt: TransferFormat = Query("ndjson", alias="format"),
+    transfer_manager: TransferManager = Depends(get_transfer_manager),
+):
+    return StreamingResponse(
+        transfer_manager.export_projects(fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="projects.{fmt}"'},
+    )
+
+@router.post("/projects/import", response_model=ImportResult, tags=["projects"], dependencies=[Depends(current_superuser)])
+async def import_projects(
+    file: UploadFile,
+    fmt: TransferFormat = Query("ndjson", alias="format"),
+    transfer_manager: TransferManager = Depends(get_transfer_manager),
+):
+    return await transfer_manager.import_projects(file, fmt)
+
+@router.get("/projects/{project_id}", response_model=ProjectDetail, response_model_exclude_unset=True, tags=["projects"])
 async def get_project(
     project_id: int,
-    project=Depends(current_active_project),
+    request: Request,
+    include: Tuple[str, ...] = Depends(parse_project_includes),
+    user: User = Depends(current_active_user),
+    project_manager: ProjectManager = Depends(get_project_manager),
 ):
-    return project
+    variant = ",".join(sorted(include))
+    if "tasks" in include and not sees_project_tasks(user):
+        # The embedded tasks are the user's own.
+        variant = f"{variant};{user.id}"
+    entry = response_cache.lookup("project", project_id, variant)
+    if entry is None or not await project_manager.can_view(project_id, user):
+        project = await project_manager.get_project(project_id, user, include)
+        body = ProjectDetail.model_validate(project, from_attributes=True).model_dump_json(exclude_unset=True)
+        entry = response_cache.store("project", project_id, variant, body.encode(), project.updated_at)
+    return cached_json_response(request, entry)
 
-@router.put("/projects/{project_id}", response_model=ProjectRead, tags=["projects"])
+@router.put("/projects/{project_id}", response_model=ProjectRead, tags=["projects"], dependencies=[Depends(write_rate_limit)])
 async def update_project(
     project_id: int,
     project_data: ProjectUpdate,
+    user: User = Depends(current_active_user),
     project_manager: ProjectManager = Depends(get_project_manager),
 ):
-    return await project_manager.update_project(project_id, project_data)
+    return await project_manager.update_project(project_id, project_data, user)
 
-@router.delete("/projects/{project_id}", tags=["projects"])
+@router.delete("/projects/{project_id}", tags=["projects"], dependencies=[Depends(write_rate_limit)])
 async def delete_project(
     project_id: int,
+    user: User = Depends(current_active_user),
     project_manager: ProjectManager = Depends(get_project_manager),
 ):
-    await project_manager.delete_project(project_id)
+    await project_manager.delete_project(project_id, user)
     return {"detail": "Project deleted successfully"}
@@ -0,0 +1,23 @@
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, Query
+
+from app.auth import User, current_active_user
+from app.pagination import NEXT_CURSOR_HEADER
+from app.schemas import SearchResult
+from app.search import SearchManager, get_search_manager
+from app.utils import json_list_response
+
+router = APIRouter()
+
+@router.get("/search", response_model=List[SearchResult], tags=["search"])
+async def search(
+    q: str = Query(..., min_length=1, max_length=100, description="Words to match; the last may be partial."),
+    kind: Optional[Literal["project", "task"]] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    user: User = Depends(current_active_user),
+    search_manager: SearchManager = Depends(get_search_manager),
+):
+    results, next_cursor = await search_manager.search(q, user, kind=kind, cursor=cursor, limit=limit)
+    return json_list_response(results, SearchResult, {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None)
@@ -1,11 +1,23 @@
-from fastapi import APIRouter, Depends
-from app.tasks import TaskManager, get_task_manager
-from app.schemas import TaskCreate, TaskUpdate, TaskRead
-from app.auth import current_active_user, User
+from typing import List, Literal, Optional
 
-router = APIRouter()
+from fastapi import APIRouter, Body, Depends, Query, Request, UploadFile
+from fastapi.responses import StreamingResponse
+from app.tasks import MAX_BULK_TASKS, TaskManager, get_task_manager
+from app.schemas import ImportResult, TaskBulkResult, TaskBulkUpdate, TaskCreate, TaskUpdate, TaskRead
+from app.auth import current_active_user, current_superuser, User
+from app.idempotency import IdempotentRoute
+from app.response_cache import cached_json_response, response_cache
+from app.ratelimit import write_rate_limit
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER
+from app.transfer import MEDIA_TYPES, TransferFormat, TransferManager, get_transfer_manager
+from app.utils import json_list_response
 
-@router.post("/", response_model=TaskRead)
+router = APIRouter(route_class=IdempotentRoute)
+
+TaskSort = Literal["created_at", "updated_at"]
+SortOrder = Literal["asc", "desc"]
+
+@router.post("/", response_model=TaskRead, dependencies=[Depends(write_rate_limit)])
 async def create_task(
     task_data: TaskCreate,
     user: User = Depends(current_active_user),
@@ -13,15 +25,96 @@ async def create_task(
 ):
     return await task_manager.create_task(task_data, user)
 
+@router.post("/tasks/bulk", response_model=TaskBulkResult, dependencies=[Depends(write_rate_limit)])
+async def create_tasks(
+    task_data: List[TaskCreate] = Body(..., min_length=1, max_length=MAX_BULK_TASKS),
+    user: User = Depends(current_active_user),
+    task_manager: TaskManager = Depends(get_task_manager),
+):
+    return await task_manager.create_tasks(task_data, user)
+
+@router.put("/tasks/bulk", response_model=TaskBulkResult, dependencies=[Depends(write_rate_limit)])
+async def update_tasks(
+    task_data: List[TaskBulkUpdate] = Body(..., min_length=1, max_length=MAX_BULK_TASKS),
+    user: User = Depends(current_active_user),
+    task_manager: TaskManager = Depends(get_task_manager),
+):
+    return await task_manager.update_tasks(task_data, user)
+
+@router.post("/tasks/bulk/delete", response_model=TaskBulkResult, dependencies=[Depends(write_rate_limit)])
+async def delete_tasks(
+    task_ids: List[int] = Body(..., min_length=1, max_length=MAX_BULK_TASKS),
+    user: User = Depends(current_active_user),
+    task_manager: TaskManager = Depends(get_task_manager),
+):
+    return await task_manager.delete_tasks(task_ids, user)
+
+@router.get("/tasks/export", dependencies=[Depends(current_superuser)])
+async def export_tasks(
+    fmt: TransferFormat = Query("ndjson", alias="format"),
+    transfer_manager: TransferManager = Depends(get_transfer_manager),
+):
+    return StreamingResponse(
+        transfer_manager.export_tasks(fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="tasks.{fmt}"'},
+    )
+
+@router.post("/tasks/import", response_model=ImportResult, dependencies=[Depends(current_superuser)])
+async def import_tasks(
+    file: UploadFile,
+    fmt: TransferFormat = Query("ndjson", alias="format"),
+    transfer_manager: TransferManager = Depends(get_transfer_manager),
+):
+    return await transfer_manager.import_tasks(file, fmt)
+
+@router.get("/projects/{project_id}/tasks", response_model=List[TaskRead])
+async def list_project_tasks(
+    project_id: int,
+    sort: TaskSort = "created_at",
+    order: SortOrder = "asc",
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    user: User = Depends(current_active_user),
+    task_manager: TaskManager = Depends(get_task_manager),
+):
+    tasks, next_cursor = await task_manager.list_project_tasks(
+        project_id, user, sort=sort, descending=order == "desc", cursor=cursor, limit=limit
+    )
+    return json_list_response(tasks, TaskRead, {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None)
+
+@router.get("/users/me/tasks", response_model=List[TaskRead])
+async def list_my_tasks(
+    sort: TaskSort = "updated_at",
+    order: SortOrder = "desc",
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    user: User = Depends(current_active_user),
+    task_manager: TaskManager = Depends(get_task_manager),
+):
+    tasks, next_cursor = await task_manager.list_user_tasks(
+        user, sort=sort, descending=order == "desc", cursor=cursor, limit=limit
+    )
+    return json_list_response(tasks, TaskRead, {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None)
+
 @router.get("/{task_id}", response_model=TaskRead)
 async def get_task(
     task_id: int,
+    request: Request,
     user: User = Depends(current_active_user),
     task_manager: TaskManager = Depends(get_task_manager),
 ):
-    return await task_manager.get_task_for_user(task_id, user)
+    entry = response_cache.lookup("task", task_id)
+    if entry is None or not await task_manager.can_view(entry.meta["project_id"], entry.meta["assignee_id"], user):
+        task = await task_manager.get_task_for_user(task_id, user)
+        body = TaskRead.model_validate(task, from_attributes=True).model_dump_json()
+        entry = response_cache.store(
+            "task", task_id, "", body.encode(), task.updated_at,
+            project_id=task.project_id, assignee_id=task.assignee_id,
+        )
+    return cached_json_response(request, entry)
 
-@router.put("/{task_id}", response_model=TaskRead)
+@router.put("/{task_id}", response_model=TaskRead, dependencies=[Depends(write_rate_limit)])
 async def update_task(
     task_id: int,
     task_data: TaskUpdate,
@@ -30,7 +123,7 @@ async def update_task(
 ):
     return await task_manager.update_task(task_id, task_data, user)
 
-@router.delete("/{task_id}")
+@router.delete("/{task_id}", dependencies=[Depends(write_rate_limit)])
 async def delete_task(
     task_id: int,
     user: User = Depends(current_active_user),
@@ -1,36 +1,45 @@
 import uuid
 from datetime import datetime
-from pydantic import BaseModel
+from typing import Any, Dict, List, Literal
+
+from pydantic import BaseModel, ConfigDict, model_validator
+from sqlalchemy import inspect
 from fastapi_users import schemas
 
+from app.models import ProjectPriority, ProjectProcessStatus, UserStatus
+
 class UserRead(schemas.BaseUser[uuid.UUID]):
     full_name: str | None = None
-    user_status: str
+    user_status: UserStatus
+
+    model_config = ConfigDict(from_attributes=True)
 
-    class Config:
-        orm_mode = True
+class _RoleProtected:
+    # user_status decides what a user can see, so like is_superuser it is only taken from
+    # superuser requests; registration and /users/me drop it.
+    def create_update_dict(self):
+        update_dict = super().create_update_dict()
+        update_dict.pop("user_status", None)
+        return update_dict
 
-class UserCreate(schemas.BaseUserCreate):
+class UserCreate(_RoleProtected, schemas.BaseUserCreate):
     full_name: str | None = None
-    user_status: str
+    user_status: UserStatus | None = None
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
-class UserUpdate(schemas.BaseUserUpdate):
+class UserUpdate(_RoleProtected, schemas.BaseUserUpdate):
     full_name: str | None = None
-    user_status: str
+    user_status: UserStatus | None = None
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class ProjectBase(BaseModel):
     project_name: str
-    project_status: str
-    project_priority: str
+    project_status: ProjectProcessStatus
+    project_priority: ProjectPriority
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
     
 class ProjectCreate(ProjectBase):
     owner_id: uuid.UUID
@@ -41,25 +50,22 @@ class ProjectRead(ProjectBase):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class ProjectUpdate(BaseModel):
     project_name: str | None = None
-    project_status: str | None = None
-    project_priority: str | None = None
+    project_status: ProjectProcessStatus | None = None
+    project_priority: ProjectPriority | None = None
     owner_id: uuid.UUID | None = None
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
         
 class TaskBase(BaseModel):
     task_name: str
     project_id: int
     assignee_id: uuid.UUID
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class TaskCreate(TaskBase):
     pass
@@ -69,13 +75,103 @@ class TaskRead(TaskBase):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+class ProjectDetail(ProjectRead):
+    tasks: List[TaskRead] | None = None
+    owner: UserRead | None = None
+
+    @model_validator(mode="before")
+    @classmethod
+    def _loaded_attributes_only(cls, data):
+        # Relationships that were not eager-loaded are left unset rather than
+        # triggering a lazy load during serialization.
+        state = inspect(data, raiseerr=False)
+        if state is None or not hasattr(state, "unloaded"):
+            return data
+        unloaded = state.unloaded.intersection(cls.model_fields)
+        if not unloaded:
+            return data
+        return {name: getattr(data, name) for name in cls.model_fields if name not in unloaded}
 
 class TaskUpdate(BaseModel):
     task_name: str | None = None
     project_id: int | None = None
     assignee_id: uuid.UUID | None = None
 
-    class Config:
-        orm_mode = True
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+class TaskBulkUpdate(TaskUpdate):
+    task_id: int
+
+class TaskBulkItemResult(BaseModel):
+    index: int
+    task_id: int | None = None
+    task: TaskRead | None = None
+    error: str | None = None
+
+class TaskBulkResult(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[TaskBulkItemResult]
+
+class ProjectTaskStats(BaseModel):
+    project_id: int
+    project_name: str | None = None
+    project_status: ProjectProcessStatus
+    project_priority: ProjectPriority
+    owner_id: uuid.UUID | None = None
+    task_count: int
+
+class AssigneeWorkload(BaseModel):
+    assignee_id: uuid.UUID | None = None
+    task_count: int
+    project_count: int
+
+class StatsBreakdown(BaseModel):
+    project_count: int = 0
+    task_count: int = 0
+
+class ProjectStats(BaseModel):
+    project_count: int
+    task_count: int
+    by_status: Dict[ProjectProcessStatus, StatsBreakdown]
+    by_priority: Dict[ProjectPriority, StatsBreakdown]
+    assignees: List[AssigneeWorkload]
+    projects: List[ProjectTaskStats]
+
+class ChangeEvent(BaseModel):
+    resource: Literal["project", "task"]
+    action: Literal["created", "updated", "deleted"]
+    id: int
+    project_ids: List[int] = []
+    assignee_ids: List[uuid.UUID] = []
+    data: Dict[str, Any] | None = None
+    occurred_at: datetime
+
+class SearchResult(BaseModel):
+    kind: Literal["project", "task"]
+    id: int
+    name: str
+    project_id: int | None = None
+    rank: float
+
+class ArchiveResult(BaseModel):
+    projects: int
+    tasks: int
+
+class ProjectImport(ProjectBase):
+    project_id: int | None = None
+    owner_id: uuid.UUID
+    created_at: datetime | None = None
+    updated_at: datetime | None = None
+
+class TaskImport(TaskBase):
+    task_id: int | None = None
+    created_at: datetime | None = None
+    updated_at: datetime | None = None
+
+class ImportResult(BaseModel):
+    received: int
+    imported: int
+    skipped: int
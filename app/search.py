@@ -0,0 +1,145 @@
+import re
+from typing import List, Optional, Tuple
+
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import and_, case, column, func, literal, literal_column, or_, table, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.db import get_async_session
+from app.models import Project, Task, User
+from app.pagination import decode_offset_cursor, encode_offset_cursor
+from app.permissions import project_visibility, task_visibility
+
+MAX_SEARCH_TERMS = 8
+MAX_SEARCH_OFFSET = 1000
+SEARCH_KINDS = ("project", "task")
+
+# Must match the expression indexes created by migration 3.
+TS_CONFIG = literal_column("'simple'::regconfig")
+
+# SQLite FTS5 fallback; rowid = id * 2 for projects, id * 2 + 1 for tasks.
+search_index = table("search_index", column("rowid"), column("name"))
+
+
+def _terms(query: str) -> List[str]:
+    return re.findall(r"\w+", query.lower())[:MAX_SEARCH_TERMS]
+
+
+def _like_prefix(query: str) -> str:
+    escaped = query.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + "%"
+
+
+class SearchManager:
+    def __init__(self, session: AsyncSession = Depends(get_async_session)):
+        self.session = session
+
+    def _postgres_query(self, query: str, terms: List[str], kinds, user: User):
+        # Every term is prefix-matched so results narrow while the user is typing.
+        tsquery = func.to_tsquery(TS_CONFIG, " & ".join(f"{term}:*" for term in terms))
+        prefix = _like_prefix(query)
+
+        def ranked(kind, id_column, name_column, project_column, *visibility):
+            lowered = func.lower(name_column)
+            vector = func.to_tsvector(TS_CONFIG, name_column)
+            starts_with = lowered.like(prefix, escape="\\")
+            rank = (
+                case((starts_with, 1.0), else_=0.0)
+                + func.ts_rank(vector, tsquery)
+                + func.similarity(lowered, query.lower())
+            )
+            return select(
+                literal(kind).label("kind"),
+                id_column.label("id"),
+                name_column.label("name"),
+                project_column.label("project_id"),
+                rank.label("rank"),
+            ).where(or_(starts_with, vector.op("@@")(tsquery), lowered.op("%")(query.lower())), *visibility)
+
+        selects = []
+        if "project" in kinds:
+            selects.append(
+                ranked(
+                    "project", Project.project_id, Project.project_name, Project.project_id,
+                    Project.deleted_at.is_(None), project_visibility(user),
+                )
+            )
+        if "task" in kinds:
+            selects.append(
+                ranked(
+                    "task", Task.task_id, Task.task_name, Task.project_id,
+                    Task.deleted_at.is_(None), task_visibility(user),
+                )
+            )
+        return union_all(*selects).subquery()
+
+    def _sqlite_query(self, query: str, terms: List[str], kinds, user: User):
+        # Soft-deleted rows are dropped from search_index by trigger (migration 4).
+        match = " ".join(f'"{term}"*' for term in terms)
+        is_task = search_index.c.rowid % 2 == 1
+        ref_id = search_index.c.rowid // 2
+        starts_with = func.lower(search_index.c.name).like(_like_prefix(query), escape="\\")
+        conditions = [literal_column("search_index").op("MATCH")(match)]
+        if kinds == ("project",):
+            conditions.append(~is_task)
+        elif kinds == ("task",):
+            conditions.append(is_task)
+        conditions.append(
+            or_(and_(~is_task, project_visibility(user, ref_id)), and_(is_task, task_visibility(user)))
+        )
+
+        return (
+            select(
+                case((is_task, "task"), else_="project").label("kind"),
+                ref_id.label("id"),
+                search_index.c.name.label("name"),
+                case((is_task, Task.project_id), else_=ref_id).label("project_id"),
+                # bm25() is lower-is-better.
+                (case((starts_with, 1.0), else_=0.0) - func.bm25(literal_column("search_index"))).label("rank"),
+            )
+            .select_from(search_index.outerjoin(Task, and_(is_task, Task.task_id == ref_id)))
+            .where(*conditions)
+            .subquery()
+        )
+
+    async def search(
+        self,
+        query: str,
+        user: User,
+        kind: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 20,
+    ) -> Tuple[list, Optional[str]]:
+        offset = decode_offset_cursor(cursor)
+        if offset > MAX_SEARCH_OFFSET:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Refine the search instead of paging this deep.",
+            )
+        terms = _terms(query)
+        if not terms:
+            return [], None
+
+        kinds = (kind,) if kind else SEARCH_KINDS
+        dialect = self.session.bind.dialect.name
+        if dialect == "postgresql":
+            results = self._postgres_query(query, terms, kinds, user)
+        elif dialect == "sqlite":
+            results = self._sqlite_query(query, terms, kinds, user)
+        else:
+            raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail="Search is not available.")
+
+        rows = await self.session.execute(
+            select(results)
+            .order_by(results.c.rank.desc(), results.c.kind, results.c.id)
+            .offset(offset)
+            .limit(limit + 1)
+        )
+        rows = rows.all()
+        next_cursor = encode_offset_cursor(offset + limit) if len(rows) > limit else None
+        return rows[:limit], next_cursor
+
+
+async def get_search_manager(session: AsyncSession = Depends(get_async_session)):
+    return SearchManager(session)
@@ -0,0 +1,107 @@
+import argparse
+import importlib.util
+import logging
+import math
+import os
+from typing import List, Optional, Tuple
+
+import uvicorn
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+CGROUP_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+
+
+def available_cpus() -> int:
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    # Containers are often given a CPU quota rather than a cpuset.
+    try:
+        with open(CGROUP_CPU_MAX) as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def worker_pool_size(max_connections: int, workers: int) -> Tuple[int, int]:
+    # (pool_size, max_overflow) per worker so that every worker at full overflow still
+    # fits in max_connections. The Postgres event listener holds one more per worker.
+    per_worker = max_connections // workers
+    if settings.events_backend == "postgres":
+        per_worker -= 1
+    if per_worker < 1:
+        raise SystemExit(
+            f"db_max_connections={max_connections} cannot serve {workers} workers; "
+            "raise it or run fewer workers."
+        )
+    pool_size = min(settings.db_pool_size, per_worker)
+    return pool_size, min(settings.db_max_overflow, per_worker - pool_size)
+
+
+def _override(name: str, value) -> None:
+    # Workers are fresh processes that rebuild Settings from the environment; the
+    # attribute covers the single-worker case, which serves from this process.
+    os.environ[name.upper()] = str(value)
+    setattr(settings, name, value)
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.serve", description="Run the API server.")
+    parser.add_argument("--host", default=settings.serve_host)
+    parser.add_argument("--port", type=int, default=settings.serve_port)
+    parser.add_argument("--workers", type=int, default=settings.serve_workers, help="0 = one per available CPU")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=settings.log_level.upper(), format="%(message)s")
+    workers = args.workers or available_cpus()
+
+    if settings.db_max_connections > 0:
+        pool_size, max_overflow = worker_pool_size(settings.db_max_connections, workers)
+        _override("db_pool_size", pool_size)
+        _override("db_max_overflow", max_overflow)
+        logger.info("%s workers, each with a pool of %s + %s overflow", workers, pool_size, max_overflow)
+
+    loop = "uvloop" if _installed("uvloop") else "asyncio"
+    http = "httptools" if _installed("httptools") else "h11"
+    if (loop, http) != ("uvloop", "httptools"):
+        logger.warning("uvloop/httptools not installed; using %s and %s.", loop, http)
+
+    # Workers exit after about serve_max_requests requests and the supervisor starts a
+    # fresh one. A single worker runs without a supervisor, so it is never recycled.
+    max_requests = settings.serve_max_requests if workers > 1 else 0
+
+    # SIGTERM stops accepting connections and lets in-flight requests finish for up to
+    # the graceful timeout before the lifespan shutdown runs.
+    # Each worker builds its own app through the factory after it has started.
+    uvicorn.run(
+        "main:create_app",
+        factory=True,
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        loop=loop,
+        http=http,
+        lifespan="on",
+        proxy_headers=True,
+        forwarded_allow_ips=settings.serve_forwarded_allow_ips,
+        limit_max_requests=max_requests or None,
+        limit_max_requests_jitter=settings.serve_max_requests_jitter if max_requests else 0,
+        timeout_graceful_shutdown=settings.serve_graceful_timeout_seconds,
+        timeout_keep_alive=settings.serve_keep_alive_seconds,
+        log_level=settings.log_level,
+    )
+
+
+if __name__ == "__main__":
+    main()
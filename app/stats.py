@@ -0,0 +1,177 @@
+import uuid
+from collections import Counter
+from typing import Dict, Iterable, Optional, Tuple
+
+from fastapi import Depends
+from sqlalchemy import distinct, func, literal
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.config import settings
+from app.db import get_async_session
+from app.models import Project, ProjectPriority, ProjectProcessStatus, ProjectTaskCount, Task, User
+from app.pagination import DEFAULT_PAGE_SIZE, apply_keyset, split_page
+from app.permissions import project_visibility, task_visibility
+from app.projects import project_filters
+from app.schemas import AssigneeWorkload, ProjectStats, ProjectTaskStats, StatsBreakdown
+
+UNASSIGNED = uuid.UUID(int=0)
+
+task_counts = ProjectTaskCount.__table__
+
+# (project_id, assignee_id) -> change in task count
+TaskCountDeltas = Dict[Tuple[int, Optional[uuid.UUID]], int]
+
+
+def count_tasks(rows: Iterable[Tuple[int, Optional[uuid.UUID]]], delta: int = 1) -> TaskCountDeltas:
+    deltas: TaskCountDeltas = Counter()
+    for project_id, assignee_id in rows:
+        deltas[(project_id, assignee_id)] += delta
+    return deltas
+
+
+def task_count_upsert(dialect_name: str):
+    dialect_insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    stmt = dialect_insert(task_counts)
+    return stmt.on_conflict_do_update(
+        index_elements=[task_counts.c.project_id, task_counts.c.assignee_id],
+        set_={"task_count": task_counts.c.task_count + stmt.excluded.task_count},
+    )
+
+
+async def apply_task_count_deltas(session: AsyncSession, deltas: TaskCountDeltas) -> None:
+    # Runs inside the caller's transaction so the counts commit together with the tasks.
+    params = [
+        {"project_id": project_id, "assignee_id": assignee_id or UNASSIGNED, "task_count": delta}
+        for (project_id, assignee_id), delta in deltas.items()
+        if delta and project_id is not None
+    ]
+    if params:
+        await session.execute(task_count_upsert(session.bind.dialect.name), params)
+
+
+def rebuild_task_counts(conn: Connection) -> None:
+    conn.execute(task_counts.delete())
+    assignee = func.coalesce(Task.assignee_id, literal(UNASSIGNED, Task.assignee_id.type))
+    conn.execute(
+        task_counts.insert().from_select(
+            ["project_id", "assignee_id", "task_count"],
+            select(Task.project_id, assignee, func.count())
+            .where(Task.project_id.is_not(None), Task.deleted_at.is_(None))
+            .group_by(Task.project_id, assignee),
+        )
+    )
+
+
+class StatsManager:
+    def __init__(self, session: AsyncSession = Depends(get_async_session)):
+        self.session = session
+
+    def _counts(self, user: User):
+        # Only the tasks the user may see are counted.
+        if settings.stats_use_summary_table:
+            return select(task_counts.c.project_id, task_counts.c.assignee_id, task_counts.c.task_count).where(
+                task_counts.c.task_count > 0,
+                task_visibility(user, task_counts.c.project_id, task_counts.c.assignee_id),
+            ).subquery()
+        return (
+            select(Task.project_id, Task.assignee_id, func.count().label("task_count"))
+            .where(Task.deleted_at.is_(None), task_visibility(user))
+            .group_by(Task.project_id, Task.assignee_id)
+            .subquery()
+        )
+
+    async def project_stats(
+        self, user: User, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE, **filters
+    ) -> Tuple[ProjectStats, Optional[str]]:
+        # The totals cover every matching project and are aggregated in the database;
+        # only the per-project list is paged, in the same order as GET /projects.
+        counts = self._counts(user)
+        visible = (*project_filters(**filters), project_visibility(user))
+        task_count = func.coalesce(func.sum(counts.c.task_count), 0)
+
+        by_status = {value: StatsBreakdown() for value in ProjectProcessStatus}
+        by_priority = {value: StatsBreakdown() for value in ProjectPriority}
+        breakdowns = await self.session.execute(
+            select(
+                Project.project_status,
+                Project.project_priority,
+                func.count(distinct(Project.project_id)).label("project_count"),
+                task_count.label("task_count"),
+            )
+            .outerjoin(counts, counts.c.project_id == Project.project_id)
+            .where(*visible)
+            .group_by(Project.project_status, Project.project_priority)
+        )
+        for row in breakdowns:
+            for breakdown in (by_status[row.project_status], by_priority[row.project_priority]):
+                breakdown.project_count += row.project_count
+                breakdown.task_count += row.task_count
+
+        workloads = await self.session.execute(
+            select(
+                counts.c.assignee_id,
+                func.sum(counts.c.task_count).label("task_count"),
+                func.count(distinct(counts.c.project_id)).label("project_count"),
+            )
+            .join(Project, Project.project_id == counts.c.project_id)
+            .where(*visible)
+            .group_by(counts.c.assignee_id)
+            .order_by(func.sum(counts.c.task_count).desc())
+        )
+        assignees = [
+            AssigneeWorkload(
+                assignee_id=None if row.assignee_id in (None, UNASSIGNED) else row.assignee_id,
+                task_count=row.task_count,
+                project_count=row.project_count,
+            )
+            for row in workloads
+        ]
+
+        page = await self.session.execute(
+            apply_keyset(
+                select(
+                    Project.project_id,
+                    Project.project_name,
+                    Project.project_status,
+                    Project.project_priority,
+                    Project.owner_id,
+                    Project.created_at,
+                    task_count.label("task_count"),
+                )
+                .outerjoin(counts, counts.c.project_id == Project.project_id)
+                .where(*visible)
+                .group_by(Project.project_id),
+                Project.created_at,
+                Project.project_id,
+                cursor,
+                limit,
+            )
+        )
+        rows, next_cursor = split_page(page.all(), "created_at", "project_id", limit)
+
+        stats = ProjectStats(
+            project_count=sum(breakdown.project_count for breakdown in by_status.values()),
+            task_count=sum(breakdown.task_count for breakdown in by_status.values()),
+            by_status=by_status,
+            by_priority=by_priority,
+            assignees=assignees,
+            projects=[
+                ProjectTaskStats(
+                    project_id=row.project_id,
+                    project_name=row.project_name,
+                    project_status=row.project_status,
+                    project_priority=row.project_priority,
+                    owner_id=row.owner_id,
+                    task_count=row.task_count,
+                )
+                for row in rows
+            ],
+        )
+        return stats, next_cursor
+
+
+async def get_stats_manager(session: AsyncSession = Depends(get_async_session)):
+    return StatsManager(session)
@@ -1,11 +1,43 @@
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import insert, literal, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from fastapi import HTTPException, status, Depends
 
 from app.db import get_async_session
+from app.events import event_bus, task_event
 from app.models import Task, Project, User
-from app.schemas import TaskCreate, TaskUpdate
+from app.pagination import DEFAULT_PAGE_SIZE, apply_keyset, split_page
+from app.permissions import (
+    add_project_members,
+    can_view_task,
+    project_visibility,
+    remove_project_members,
+    task_visibility,
+)
+from app.response_cache import response_cache
+from app.stats import apply_task_count_deltas, count_tasks
+from app.schemas import TaskBulkItemResult, TaskBulkResult, TaskBulkUpdate, TaskCreate, TaskRead, TaskUpdate
+
+MAX_BULK_TASKS = 5000
+
+TASK_NOT_FOUND = "Task not found"
+TASK_FORBIDDEN = "You do not have access to this task."
+PROJECT_NOT_FOUND = "Project not found"
+TASK_NAME_TAKEN = "Task name already exists"
+DUPLICATE_TASK_ID = "Task appears more than once in this batch"
+
 
+def _task_read(task: Task) -> TaskRead:
+    return TaskRead.model_validate(task, from_attributes=True)
+
+
+def _bulk_result(results: List[TaskBulkItemResult]) -> TaskBulkResult:
+    failed = sum(1 for item in results if item.error is not None)
+    return TaskBulkResult(succeeded=len(results) - failed, failed=failed, results=results)
 
 
 class TaskManager:
@@ -13,7 +45,7 @@ class TaskManager:
         self.session = session
 
     async def get_task(self, task_id: int) -> Task:
-        result = await self.session.execute(select(Task).where(Task.task_id == task_id))
+        result = await self.session.execute(select(Task).where(Task.task_id == task_id, Task.deleted_at.is_(None)))
         task = result.scalars().first()
 
         if not task:
@@ -24,48 +56,403 @@ class TaskManager:
 
         return task
 
+    async def can_view(self, project_id: Optional[int], assignee_id, user: User) -> bool:
+        return await can_view_task(self.session, user, project_id, assignee_id)
+
+    async def _raise_missing_or_forbidden(self, task_id: int):
+        # Only reached when a visibility-scoped statement matched no row.
+        exists = await self.session.scalar(
+            select(Task.task_id).where(Task.task_id == task_id, Task.deleted_at.is_(None))
+        )
+        if exists is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have access to this task.",
+        )
+
     async def get_task_for_user(self, task_id: int, user: User) -> Task:
-        task = await self.get_task(task_id)
+        task = await self.session.scalar(
+            select(Task).where(Task.task_id == task_id, Task.deleted_at.is_(None), task_visibility(user))
+        )
+        if task is None:
+            await self._raise_missing_or_forbidden(task_id)
 
-        if task.assignee_id != user.id:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You do not have access to this task.",
+        return task
+
+    async def _page(
+        self,
+        query,
+        sort: str,
+        descending: bool,
+        cursor: Optional[str],
+        limit: int,
+    ) -> Tuple[List[Task], Optional[str]]:
+        query = apply_keyset(query, getattr(Task, sort), Task.task_id, cursor, limit, descending)
+        result = await self.session.execute(query)
+        return split_page(result.scalars().all(), sort, "task_id", limit)
+
+    async def list_project_tasks(
+        self,
+        project_id: int,
+        user: User,
+        sort: str = "created_at",
+        descending: bool = False,
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+    ) -> Tuple[List[Task], Optional[str]]:
+        tasks, next_cursor = await self._page(
+            select(Task).where(Task.project_id == project_id, Task.deleted_at.is_(None), task_visibility(user)),
+            sort,
+            descending,
+            cursor,
+            limit,
+        )
+        if not tasks and cursor is None:
+            project_result = await self.session.execute(
+                select(Project.project_id).where(
+                    Project.project_id == project_id, Project.deleted_at.is_(None), project_visibility(user)
+                )
             )
+            if project_result.scalar() is None:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
+        return tasks, next_cursor
 
-        return task
+    async def list_user_tasks(
+        self,
+        user: User,
+        sort: str = "updated_at",
+        descending: bool = True,
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+    ) -> Tuple[List[Task], Optional[str]]:
+        return await self._page(
+            select(Task).where(Task.assignee_id == user.id, Task.deleted_at.is_(None)), sort, descending, cursor, limit
+        )
 
     async def create_task(self, task_data: TaskCreate, user: User) -> Task:
-        project_result = await self.session.execute(select(Project).where(Project.project_id == task_data.project_id))
-        project = project_result.scalars().first()
+        # Selecting from projects_info makes the existence check part of the INSERT.
+        source = select(
+            literal(task_data.task_name, Task.task_name.type),
+            Project.project_id,
+            literal(user.id, Task.assignee_id.type),
+        ).where(Project.project_id == task_data.project_id, Project.deleted_at.is_(None), project_visibility(user))
+        try:
+            new_task = await self.session.scalar(
+                insert(Task)
+                .from_select(["task_name", "project_id", "assignee_id"], source)
+                .returning(Task)
+            )
+        except IntegrityError:
+            await self._raise_name_taken()
 
-        if not project:
+        if new_task is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
 
-        new_task = Task(**task_data.model_dump(), assignee_id=user.id)
-        self.session.add(new_task)
+        await apply_task_count_deltas(self.session, count_tasks([(new_task.project_id, new_task.assignee_id)]))
+        await add_project_members(self.session, [(new_task.project_id, new_task.assignee_id)])
         await self.session.commit()
-        await self.session.refresh(new_task)
+        response_cache.evict("project", new_task.project_id)
+        await event_bus.publish(task_event("created", new_task.task_id, [new_task.project_id], [user.id], new_task))
 
         return new_task
     
     async def update_task(self, task_id: int, task_data: TaskUpdate, user: User) -> Task:
-        task = await self.get_task_for_user(task_id, user)
+        values = task_data.model_dump(exclude_unset=True)
+        if not values:
+            return await self.get_task_for_user(task_id, user)
+
+        if "project_id" in values and not await self._existing_project_ids([values["project_id"]], user):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=PROJECT_NOT_FOUND)
 
-        for key, value in task_data.model_dump(exclude_unset=True).items():
-            setattr(task, key, value)
+        previous = None
+        if "project_id" in values or "assignee_id" in values:
+            previous = await self.session.execute(
+                select(Task.project_id, Task.assignee_id).where(
+                    Task.task_id == task_id, Task.deleted_at.is_(None), task_visibility(user)
+                )
+            )
+            previous = previous.first()
+        try:
+            task = await self.session.scalar(
+                update(Task)
+                .where(Task.task_id == task_id, Task.deleted_at.is_(None), task_visibility(user))
+                .values(**values)
+                .returning(Task)
+                .execution_options(populate_existing=True)
+            )
+        except IntegrityError:
+            await self._raise_name_taken()
+        if task is None:
+            await self._raise_missing_or_forbidden(task_id)
 
-        self.session.add(task)
+        previous_project_id, previous_assignee_id = previous or (task.project_id, task.assignee_id)
+        deltas = count_tasks([(previous_project_id, previous_assignee_id)], -1)
+        deltas.update(count_tasks([(task.project_id, task.assignee_id)]))
+        await apply_task_count_deltas(self.session, deltas)
+        await add_project_members(self.session, [(task.project_id, task.assignee_id)])
+        if (previous_project_id, previous_assignee_id) != (task.project_id, task.assignee_id):
+            await remove_project_members(self.session, [(previous_project_id, previous_assignee_id)])
         await self.session.commit()
-        await self.session.refresh(task)
+        self._evict_cached(task_ids=[task_id], project_ids=[previous_project_id, task.project_id])
+        await event_bus.publish(
+            task_event(
+                "updated",
+                task_id,
+                [previous_project_id, task.project_id],
+                [previous_assignee_id, task.assignee_id],
+                task,
+            )
+        )
 
         return task
 
+    def _evict_cached(self, task_ids: Iterable[int] = (), project_ids: Iterable[int] = ()):
+        response_cache.evict("task", *task_ids)
+        response_cache.evict("project", *set(project_ids))
+
+    async def _existing_project_ids(self, project_ids: Iterable[int], user: User) -> set:
+        project_ids = set(project_ids)
+        if not project_ids:
+            return set()
+        result = await self.session.scalars(
+            select(Project.project_id).where(
+                Project.project_id.in_(project_ids), Project.deleted_at.is_(None), project_visibility(user)
+            )
+        )
+        return set(result.all())
+
+    async def _task_owners(self, task_ids: Iterable[int], user: User) -> dict:
+        result = await self.session.execute(
+            select(Task.task_id, Task.assignee_id, Task.project_id).where(
+                Task.task_id.in_(set(task_ids)), Task.deleted_at.is_(None), task_visibility(user)
+            )
+        )
+        return {row.task_id: row for row in result}
+
+    async def _existing_task_ids(self, task_ids: Iterable[int]) -> set:
+        # Tells "forbidden" from "not found" for ids _task_owners did not return.
+        task_ids = set(task_ids)
+        if not task_ids:
+            return set()
+        result = await self.session.scalars(
+            select(Task.task_id).where(Task.task_id.in_(task_ids), Task.deleted_at.is_(None))
+        )
+        return set(result.all())
+
+    async def _raise_name_taken(self):
+        # Names are unique across live and soft-deleted tasks until the latter are archived.
+        await self.session.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=TASK_NAME_TAKEN)
+
+    async def _raise_batch_conflict(self, names: Optional[Dict[str, Optional[int]]] = None):
+        # names maps each name the batch writes to the task meant to hold it (None for new
+        # tasks); one now held by another task means the batch lost a name race.
+        await self.session.rollback()
+        if names:
+            holders = await self.session.execute(
+                select(Task.task_name, Task.task_id).where(Task.task_name.in_(names))
+            )
+            if any(names[name] != task_id for name, task_id in holders):
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=TASK_NAME_TAKEN)
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Batch conflicts with concurrent changes; nothing was written.",
+        )
+
+    async def _commit_bulk(self):
+        try:
+            await self.session.commit()
+        except IntegrityError:
+            await self._raise_batch_conflict()
+
+    async def create_tasks(self, items: List[TaskCreate], user: User) -> TaskBulkResult:
+        results: List[Optional[TaskBulkItemResult]] = [None] * len(items)
+        projects = await self._existing_project_ids((item.project_id for item in items), user)
+        # Names are unique across live and soft-deleted tasks until the latter are archived.
+        taken_result = await self.session.scalars(
+            select(Task.task_name).where(Task.task_name.in_({item.task_name for item in items}))
+        )
+        taken_names = set(taken_result.all())
+
+        rows, row_indexes = [], []
+        for index, item in enumerate(items):
+            if item.project_id not in projects:
+                results[index] = TaskBulkItemResult(index=index, error=PROJECT_NOT_FOUND)
+            elif item.task_name in taken_names:
+                results[index] = TaskBulkItemResult(index=index, error=TASK_NAME_TAKEN)
+            else:
+                taken_names.add(item.task_name)
+                rows.append({**item.model_dump(), "assignee_id": user.id})
+                row_indexes.append(index)
+
+        if rows:
+            # A concurrent writer can take a name after the check above.
+            try:
+                created = await self.session.scalars(insert(Task).returning(Task, sort_by_parameter_order=True), rows)
+            except IntegrityError:
+                await self._raise_batch_conflict({row["task_name"]: None for row in rows})
+            created_tasks = created.all()
+            for index, task in zip(row_indexes, created_tasks):
+                results[index] = TaskBulkItemResult(index=index, task_id=task.task_id, task=_task_read(task))
+            await apply_task_count_deltas(
+                self.session, count_tasks((row["project_id"], row["assignee_id"]) for row in rows)
+            )
+            await add_project_members(self.session, ((row["project_id"], row["assignee_id"]) for row in rows))
+            await self._commit_bulk()
+            self._evict_cached(project_ids=[row["project_id"] for row in rows])
+            await event_bus.publish(*(
+                task_event("created", task.task_id, [task.project_id], [user.id], task) for task in created_tasks
+            ))
+
+        return _bulk_result(results)
+
+    async def update_tasks(self, items: List[TaskBulkUpdate], user: User) -> TaskBulkResult:
+        results: List[Optional[TaskBulkItemResult]] = [None] * len(items)
+        owners = await self._task_owners((item.task_id for item in items), user)
+        hidden = await self._existing_task_ids(item.task_id for item in items if item.task_id not in owners)
+        projects = await self._existing_project_ids(
+            (item.project_id for item in items if item.project_id is not None), user
+        )
+        new_names = {item.task_name for item in items if item.task_name is not None}
+        name_owners = {}
+        if new_names:
+            name_result = await self.session.execute(
+                select(Task.task_name, Task.task_id).where(Task.task_name.in_(new_names))
+            )
+            name_owners = dict(name_result.all())
+
+        now = datetime.now(timezone.utc)
+        params, seen = [], set()
+        for index, item in enumerate(items):
+            changes = item.model_dump(exclude_unset=True, exclude={"task_id"})
+            error = None
+            if item.task_id in seen:
+                error = DUPLICATE_TASK_ID
+            elif item.task_id in hidden:
+                error = TASK_FORBIDDEN
+            elif item.task_id not in owners:
+                error = TASK_NOT_FOUND
+            elif "project_id" in changes and changes["project_id"] not in projects:
+                error = PROJECT_NOT_FOUND
+            elif name_owners.get(changes.get("task_name"), item.task_id) != item.task_id:
+                error = TASK_NAME_TAKEN
+            seen.add(item.task_id)
+
+            if error is not None:
+                results[index] = TaskBulkItemResult(index=index, task_id=item.task_id, error=error)
+                continue
+            if "task_name" in changes:
+                name_owners[changes["task_name"]] = item.task_id
+            if changes:
+                params.append({"task_id": item.task_id, **changes, "updated_at": now})
+
+        if params:
+            try:
+                await self.session.execute(update(Task), params)
+            except IntegrityError:
+                await self._raise_batch_conflict(
+                    {row["task_name"]: row["task_id"] for row in params if "task_name" in row}
+                )
+
+        updated_ids = [item.task_id for index, item in enumerate(items) if results[index] is None]
+        if updated_ids:
+            refreshed = await self.session.scalars(
+                select(Task).where(Task.task_id.in_(updated_ids)).execution_options(populate_existing=True)
+            )
+            tasks = {task.task_id: task for task in refreshed.all()}
+            for index, item in enumerate(items):
+                if results[index] is None:
+                    results[index] = TaskBulkItemResult(
+                        index=index, task_id=item.task_id, task=_task_read(tasks[item.task_id])
+                    )
+            # Unchanged placements cancel out and are skipped.
+            previous = [owners[task_id] for task_id in updated_ids]
+            deltas = count_tasks(((row.project_id, row.assignee_id) for row in previous), -1)
+            deltas.update(count_tasks((task.project_id, task.assignee_id) for task in tasks.values()))
+            await apply_task_count_deltas(self.session, deltas)
+            await add_project_members(self.session, ((task.project_id, task.assignee_id) for task in tasks.values()))
+            await remove_project_members(
+                self.session,
+                (
+                    (row.project_id, row.assignee_id)
+                    for row in previous
+                    if (row.project_id, row.assignee_id) != (tasks[row.task_id].project_id, tasks[row.task_id].assignee_id)
+                ),
+            )
+            await self._commit_bulk()
+            self._evict_cached(
+                task_ids=updated_ids,
+                project_ids=[row.project_id for row in previous] + [task.project_id for task in tasks.values()],
+            )
+            await event_bus.publish(*(
+                task_event(
+                    "updated",
+                    row.task_id,
+                    [row.project_id, tasks[row.task_id].project_id],
+                    [row.assignee_id, tasks[row.task_id].assignee_id],
+                    tasks[row.task_id],
+                )
+                for row in previous
+            ))
+
+        return _bulk_result(results)
+
+    async def delete_tasks(self, task_ids: List[int], user: User) -> TaskBulkResult:
+        results: List[TaskBulkItemResult] = []
+        owners = await self._task_owners(task_ids, user)
+        hidden = await self._existing_task_ids(task_id for task_id in task_ids if task_id not in owners)
+
+        deletable, seen = [], set()
+        for index, task_id in enumerate(task_ids):
+            error = None
+            if task_id in seen:
+                error = DUPLICATE_TASK_ID
+            elif task_id in hidden:
+                error = TASK_FORBIDDEN
+            elif task_id not in owners:
+                error = TASK_NOT_FOUND
+            else:
+                deletable.append(task_id)
+            seen.add(task_id)
+            results.append(TaskBulkItemResult(index=index, task_id=task_id, error=error))
+
+        if deletable:
+            deleted = await self.session.execute(
+                update(Task)
+                .where(Task.task_id.in_(deletable))
+                .values(deleted_at=datetime.now(timezone.utc))
+                .returning(Task.task_id, Task.project_id, Task.assignee_id)
+            )
+            deleted = deleted.all()
+            await apply_task_count_deltas(
+                self.session, count_tasks(((row.project_id, row.assignee_id) for row in deleted), -1)
+            )
+            await remove_project_members(self.session, ((row.project_id, row.assignee_id) for row in deleted))
+            await self._commit_bulk()
+            self._evict_cached(task_ids=deletable, project_ids=[row.project_id for row in deleted])
+            await event_bus.publish(*(
+                task_event("deleted", row.task_id, [row.project_id], [row.assignee_id]) for row in deleted
+            ))
+
+        return _bulk_result(results)
+
     async def delete_task(self, task_id: int, user: User):
-        task = await self.get_task_for_user(task_id, user)
+        deleted = await self.session.execute(
+            update(Task)
+            .where(Task.task_id == task_id, Task.deleted_at.is_(None), task_visibility(user))
+            .values(deleted_at=datetime.now(timezone.utc))
+            .returning(Task.task_id, Task.project_id, Task.assignee_id)
+        )
+        deleted = deleted.first()
+        if deleted is None:
+            await self._raise_missing_or_forbidden(task_id)
 
-        await self.session.delete(task)
+        await apply_task_count_deltas(self.session, count_tasks([(deleted.project_id, deleted.assignee_id)], -1))
+        await remove_project_members(self.session, [(deleted.project_id, deleted.assignee_id)])
         await self.session.commit()
+        self._evict_cached(task_ids=[task_id], project_ids=[deleted.project_id])
+        await event_bus.publish(task_event("deleted", task_id, [deleted.project_id], [deleted.assignee_id]))
         
 async def get_task_manager(session: AsyncSession = Depends(get_async_session)):
     return TaskManager(session)
@@ -0,0 +1,63 @@
+import time
+from typing import Any, Dict, Hashable, List, Optional
+
+import jwt
+
+from app.config import SettingsBound
+
+DEFAULT_KID = "default"
+
+
+class KeyRing:
+    # Signs with the active key and verifies with whichever key the token's `kid`
+    # header names, so a new key can be rolled out while older tokens stay valid.
+    def __init__(self, keys: Dict[str, str], active_kid: str, algorithm: str):
+        if active_kid not in keys:
+            raise ValueError(f"Active JWT key {active_kid!r} is not configured")
+        self.keys = keys
+        self.active_kid = active_kid
+        self.algorithm = algorithm
+
+    @property
+    def active_key(self) -> str:
+        return self.keys[self.active_kid]
+
+    def encode(self, claims: Dict[str, Any]) -> str:
+        return jwt.encode(claims, self.active_key, algorithm=self.algorithm, headers={"kid": self.active_kid})
+
+    def decode(self, token: str, audience: Optional[List[str]] = None) -> Dict[str, Any]:
+        # Tokens issued before key rotation carry no kid and were signed with secret_key.
+        kid = jwt.get_unverified_header(token).get("kid", DEFAULT_KID)
+        key = self.keys.get(kid)
+        if key is None:
+            raise jwt.InvalidKeyError(f"Unknown key id {kid!r}")
+        return jwt.decode(token, key, algorithms=[self.algorithm], audience=audience)
+
+
+class RevocationList:
+    # Revoked token ids with their expiry. Unlike an LRU nothing is evicted early, as
+    # that would make a revoked token valid again; expired ids are pruned instead.
+    def __init__(self, prune_every: int = 1024):
+        self.prune_every = prune_every
+        self._expires: Dict[Hashable, float] = {}
+
+    def revoke(self, token_id: Hashable, expires_at: Optional[float]) -> None:
+        self._expires[token_id] = expires_at if expires_at is not None else float("inf")
+        if len(self._expires) % self.prune_every == 0:
+            now = time.time()
+            self._expires = {key: expiry for key, expiry in self._expires.items() if expiry > now}
+
+    def __contains__(self, token_id: Hashable) -> bool:
+        return token_id in self._expires
+
+    def __len__(self) -> int:
+        return len(self._expires)
+
+
+key_ring = SettingsBound(
+    lambda config: KeyRing(
+        {DEFAULT_KID: config.secret_key, **config.jwt_signing_keys},
+        active_kid=config.jwt_active_kid,
+        algorithm=config.algorithm,
+    )
+)
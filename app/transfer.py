@@ -0,0 +1,329 @@
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from itertools import islice
+from typing import AsyncIterator, Iterator, List, Literal, Type
+
+from fastapi import Depends, HTTPException, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, and_, cast, func, literal
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.db import get_async_session, read_session_maker
+from app.events import event_bus, project_event, task_event
+from app.models import GUID, Project, Task, User
+from app.pagination import STREAM_BATCH_SIZE
+from app.permissions import add_project_members, member_insert
+from app.response_cache import response_cache
+from app.schemas import ImportResult, ProjectImport, ProjectRead, TaskImport, TaskRead
+from app.stats import UNASSIGNED, apply_task_count_deltas, count_tasks, task_count_upsert
+from app.utils import NDJSON_MEDIA_TYPE
+
+TransferFormat = Literal["ndjson", "csv"]
+MEDIA_TYPES = {"ndjson": NDJSON_MEDIA_TYPE, "csv": "text/csv"}
+IMPORT_BATCH_SIZE = 10000
+
+# Staging tables for the COPY path. Untyped enums and no constraints, so every row
+# lands and the merge decides what is kept; dropped when the import commits.
+_staging = MetaData()
+project_staging = Table(
+    "import_projects",
+    _staging,
+    Column("project_id", Integer),
+    Column("project_name", String),
+    Column("project_status", String),
+    Column("project_priority", String),
+    Column("owner_id", GUID),
+    Column("created_at", DateTime(timezone=True)),
+    Column("updated_at", DateTime(timezone=True)),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
+task_staging = Table(
+    "import_tasks",
+    _staging,
+    Column("task_id", Integer),
+    Column("task_name", String),
+    Column("project_id", Integer),
+    Column("assignee_id", GUID),
+    Column("created_at", DateTime(timezone=True)),
+    Column("updated_at", DateTime(timezone=True)),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
+
+
+def _encode(rows, schema: Type[BaseModel], fmt: TransferFormat) -> bytes:
+    if fmt == "ndjson":
+        return b"".join(
+            schema.model_validate(row, from_attributes=True).model_dump_json().encode() + b"\n" for row in rows
+        )
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        data = schema.model_validate(row, from_attributes=True).model_dump(mode="json")
+        writer.writerow(["" if data[name] is None else data[name] for name in schema.model_fields])
+    return buffer.getvalue().encode()
+
+
+def _records(upload: UploadFile, fmt: TransferFormat) -> Iterator[dict]:
+    # Starlette spools uploads to a temporary file; it is read back one line at a time.
+    text = io.TextIOWrapper(upload.file, encoding="utf-8", newline="")
+    if fmt == "csv":
+        for record in csv.DictReader(text):
+            # Empty cells are NULL, matching the export.
+            yield {key: value or None for key, value in record.items()}
+    else:
+        for line in text:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _rows(batch: List[BaseModel], now: datetime) -> List[dict]:
+    return [
+        {**item.model_dump(), "created_at": item.created_at or now, "updated_at": item.updated_at or now}
+        for item in batch
+    ]
+
+
+def _next_batch(records: Iterator[dict], schema: Type[BaseModel], start: int) -> List[BaseModel]:
+    # Runs in a worker thread: file reads and validation would otherwise block the loop.
+    batch = []
+    try:
+        for record in islice(records, IMPORT_BATCH_SIZE):
+            batch.append(schema.model_validate(record))
+    except (ValueError, csv.Error) as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"Record {start + len(batch)}: {exc}"
+        )
+    return batch
+
+
+class TransferManager:
+    def __init__(self, session: AsyncSession = Depends(get_async_session)):
+        self.session = session
+
+    async def export_projects(self, fmt: TransferFormat) -> AsyncIterator[bytes]:
+        async for chunk in self._export(Project, Project.project_id, ProjectRead, fmt):
+            yield chunk
+
+    async def export_tasks(self, fmt: TransferFormat) -> AsyncIterator[bytes]:
+        async for chunk in self._export(Task, Task.task_id, TaskRead, fmt):
+            yield chunk
+
+    async def _export(self, model, order_column, schema: Type[BaseModel], fmt: TransferFormat) -> AsyncIterator[bytes]:
+        # Plain column rows rather than ORM instances: nothing accumulates in an identity map.
+        query = (
+            select(*(getattr(model, name) for name in schema.model_fields))
+            .where(model.deleted_at.is_(None))
+            .order_by(order_column)
+            .execution_options(yield_per=STREAM_BATCH_SIZE)
+        )
+        if fmt == "csv":
+            yield (",".join(schema.model_fields) + "\r\n").encode()
+        # The body is streamed after the request-scoped session is released.
+        async with read_session_maker() as session:
+            result = await session.stream(query)
+            async for rows in result.partitions():
+                yield _encode(rows, schema, fmt)
+
+    async def _batches(self, upload: UploadFile, fmt: TransferFormat, schema: Type[BaseModel]):
+        records = _records(upload, fmt)
+        received = 0
+        while True:
+            batch = await run_in_threadpool(_next_batch, records, schema, received + 1)
+            if not batch:
+                return
+            received += len(batch)
+            yield batch
+
+    def _uses_copy(self) -> bool:
+        return self.session.bind.dialect.driver == "asyncpg"
+
+    async def _copy(self, staging: Table, upload: UploadFile, fmt: TransferFormat, schema, to_record) -> int:
+        connection = await self.session.connection()
+        await connection.run_sync(staging.create)
+        raw = await connection.get_raw_connection()
+        columns = [column.name for column in staging.columns]
+        received = 0
+        async for batch in self._batches(upload, fmt, schema):
+            await raw.driver_connection.copy_records_to_table(
+                staging.name, records=[to_record(item) for item in batch], columns=columns
+            )
+            received += len(batch)
+        return received
+
+    async def import_projects(self, upload: UploadFile, fmt: TransferFormat) -> ImportResult:
+        now = datetime.now(timezone.utc)
+        if self._uses_copy():
+            received = await self._copy(
+                project_staging, upload, fmt, ProjectImport,
+                lambda item: (
+                    item.project_id, item.project_name, item.project_status.name, item.project_priority.name,
+                    item.owner_id, item.created_at or now, item.updated_at or now,
+                ),
+            )
+            imported = await self._merge_projects()
+        else:
+            received, imported = 0, []
+            async for batch in self._batches(upload, fmt, ProjectImport):
+                received += len(batch)
+                users = await self._existing_user_ids(item.owner_id for item in batch)
+                rows = _rows([item for item in batch if item.owner_id in users], now)
+                if not rows:
+                    continue
+                inserted = await self.session.execute(
+                    self._insert(Project).on_conflict_do_nothing().returning(*Project.__table__.columns), rows
+                )
+                inserted = inserted.all()
+                await add_project_members(self.session, ((row.project_id, row.owner_id) for row in inserted))
+                imported += inserted
+        await self.session.commit()
+        response_cache.evict("project", *(row.project_id for row in imported))
+        await event_bus.publish(*(project_event("created", row.project_id, row) for row in imported))
+        return ImportResult(received=received, imported=len(imported), skipped=received - len(imported))
+
+    async def import_tasks(self, upload: UploadFile, fmt: TransferFormat) -> ImportResult:
+        now = datetime.now(timezone.utc)
+        if self._uses_copy():
+            received = await self._copy(
+                task_staging, upload, fmt, TaskImport,
+                lambda item: (
+                    item.task_id, item.task_name, item.project_id, item.assignee_id,
+                    item.created_at or now, item.updated_at or now,
+                ),
+            )
+            imported = await self._merge_tasks()
+        else:
+            received, imported = 0, []
+            async for batch in self._batches(upload, fmt, TaskImport):
+                received += len(batch)
+                live = await self.session.scalars(
+                    select(Project.project_id).where(
+                        Project.project_id.in_({item.project_id for item in batch}), Project.deleted_at.is_(None)
+                    )
+                )
+                live = set(live.all())
+                users = await self._existing_user_ids(item.assignee_id for item in batch)
+                rows = _rows([item for item in batch if item.project_id in live and item.assignee_id in users], now)
+                if not rows:
+                    continue
+                inserted = await self.session.execute(
+                    self._insert(Task).on_conflict_do_nothing().returning(*Task.__table__.columns), rows
+                )
+                inserted = inserted.all()
+                placements = [(row.project_id, row.assignee_id) for row in inserted]
+                await apply_task_count_deltas(self.session, count_tasks(placements))
+                await add_project_members(self.session, placements)
+                imported += inserted
+        await self.session.commit()
+        response_cache.evict("task", *(row.task_id for row in imported))
+        response_cache.evict("project", *{row.project_id for row in imported})
+        await event_bus.publish(*(
+            task_event("created", row.task_id, [row.project_id], [row.assignee_id], row) for row in imported
+        ))
+        return ImportResult(received=received, imported=len(imported), skipped=received - len(imported))
+
+    async def _existing_user_ids(self, user_ids) -> set:
+        # SQLite does not enforce the foreign keys; the COPY merge applies the same filter.
+        result = await self.session.scalars(select(User.id).where(User.id.in_(set(user_ids) - {None})))
+        return set(result.all())
+
+    def _insert(self, model):
+        dialect_insert = postgresql.insert if self.session.bind.dialect.name == "postgresql" else sqlite.insert
+        return dialect_insert(model)
+
+    async def _reserve_ids(self, staging: Table, id_column, sequence) -> None:
+        # Rows without an id draw from the sequence, so it must first move past every
+        # explicit id in the file; otherwise generated ids would collide and be skipped.
+        # It only ever moves forward: ids above the live maximum may belong to archived
+        # rows or to inserts still in flight. greatest() ignores the NULL last value of
+        # a sequence that has never been used.
+        await self.session.execute(
+            select(
+                func.setval(
+                    sequence,
+                    func.greatest(
+                        func.pg_sequence_last_value(cast(sequence, postgresql.REGCLASS)),
+                        select(func.max(id_column)).scalar_subquery(),
+                        select(func.max(staging.c[id_column.key])).scalar_subquery(),
+                    ),
+                )
+            )
+        )
+
+    async def _merge_projects(self) -> list:
+        staging = project_staging
+        sequence = func.pg_get_serial_sequence(Project.__tablename__, "project_id")
+        await self._reserve_ids(staging, Project.project_id, sequence)
+        source = select(
+            func.coalesce(staging.c.project_id, func.nextval(sequence)),
+            staging.c.project_name,
+            cast(staging.c.project_status, Project.project_status.type),
+            cast(staging.c.project_priority, Project.project_priority.type),
+            staging.c.owner_id,
+            staging.c.created_at,
+            staging.c.updated_at,
+        ).where(staging.c.owner_id.in_(select(User.id)))
+        # Rows whose id or name already exists are skipped, not overwritten.
+        inserted = (
+            postgresql.insert(Project)
+            .from_select([column.name for column in staging.columns], source)
+            .on_conflict_do_nothing()
+            .returning(*Project.__table__.columns)
+            .cte("inserted")
+        )
+        members = member_insert("postgresql").from_select(
+            ["project_id", "user_id"], select(inserted.c.project_id, inserted.c.owner_id)
+        ).cte("members")
+        result = await self.session.execute(select(inserted).add_cte(members))
+        return result.all()
+
+    async def _merge_tasks(self) -> list:
+        staging = task_staging
+        sequence = func.pg_get_serial_sequence(Task.__tablename__, "task_id")
+        await self._reserve_ids(staging, Task.task_id, sequence)
+        source = (
+            select(
+                func.coalesce(staging.c.task_id, func.nextval(sequence)),
+                staging.c.task_name,
+                staging.c.project_id,
+                staging.c.assignee_id,
+                staging.c.created_at,
+                staging.c.updated_at,
+            )
+            .select_from(
+                staging.join(Project, and_(Project.project_id == staging.c.project_id, Project.deleted_at.is_(None)))
+            )
+            .where(staging.c.assignee_id.in_(select(User.id)))
+        )
+        inserted = (
+            postgresql.insert(Task)
+            .from_select([column.name for column in staging.columns], source)
+            .on_conflict_do_nothing()
+            .returning(*Task.__table__.columns)
+            .cte("inserted")
+        )
+        # The summary counts and memberships are updated by the same statement, from the rows it inserted.
+        assignee = func.coalesce(inserted.c.assignee_id, literal(UNASSIGNED, GUID()))
+        counted = (
+            task_count_upsert("postgresql")
+            .from_select(
+                ["project_id", "assignee_id", "task_count"],
+                select(inserted.c.project_id, assignee, func.count()).group_by(inserted.c.project_id, assignee),
+            )
+            .cte("counted")
+        )
+        members = member_insert("postgresql").from_select(
+            ["project_id", "user_id"], select(inserted.c.project_id, inserted.c.assignee_id).distinct()
+        ).cte("members")
+        result = await self.session.execute(select(inserted).add_cte(counted, members))
+        return result.all()
+
+
+async def get_transfer_manager(session: AsyncSession = Depends(get_async_session)):
+    return TransferManager(session)
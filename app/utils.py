@@ -1,22 +1,44 @@
-import aiosmtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from functools import lru_cache
+from typing import AsyncIterable, AsyncIterator, Iterable, List, Mapping, Optional, Type
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
 from app.config import settings
 
-async def send_email(subject: str, recipient: str, body: str):
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def build_email_message(subject: str, recipients: List[str], body: str) -> MIMEMultipart:
     message = MIMEMultipart()
     message["From"] = settings.email_from
-    message["To"] = recipient
+    message["To"] = ", ".join(recipients)
     message["Subject"] = subject
 
     message.attach(MIMEText(body, "plain"))
+    return message
+
+
+async def iter_ndjson(rows: AsyncIterable, schema: Type[BaseModel], **dump_options) -> AsyncIterator[str]:
+    async for row in rows:
+        yield schema.model_validate(row, from_attributes=True).model_dump_json(**dump_options) + "\n"
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(schema: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[schema])
 
-    await aiosmtplib.send(
-        message,
-        hostname=settings.smtp_server,
-        port=settings.smtp_port,
-        username=settings.smtp_user,
-        password=settings.smtp_password,
-        start_tls=True,
-    )
 
+def json_list_response(
+    rows: Iterable,
+    schema: Type[BaseModel],
+    headers: Optional[Mapping[str, str]] = None,
+    **dump_options,
+) -> Response:
+    # ORM rows are read straight into `schema` instances and serialized to bytes by
+    # pydantic-core, skipping FastAPI's response_model re-validation and jsonable_encoder.
+    adapter = _list_adapter(schema)
+    body = adapter.dump_json(adapter.validate_python(rows, from_attributes=True), **dump_options)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,130 @@
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Cumulative import time per entry point, in milliseconds. Generous enough to absorb a
+# noisy CI machine; a module that starts building engines or loading drivers at import
+# blows well past them.
+BUDGETS_MS = {
+    "app.config": 400,
+    "app.schemas": 1500,
+    "app.serve": 700,
+    "main": 1000,
+}
+# Dependencies the app only loads once it opens a connection or hashes a password. If
+# one shows up while importing an entry point, something is building a singleton too
+# early. (bcrypt is not listed: fastapi_users imports it along with the User model.)
+DEFERRED_MODULES = ("asyncpg", "aiosqlite", "passlib")
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.import_time",
+        description="Measure import time of the app's entry points with -X importtime and check it against a budget.",
+    )
+    parser.add_argument("modules", nargs="*", default=list(BUDGETS_MS), help="defaults to every budgeted module")
+    parser.add_argument(
+        "--budget", action="append", default=[], metavar="MODULE=MS", help="override a budget, may be repeated"
+    )
+    parser.add_argument("--runs", type=int, default=3, help="report the fastest of this many fresh interpreters")
+    parser.add_argument("--top", type=int, default=0, help="also print the N slowest imports of each module")
+    parser.add_argument("--output", type=Path, help="write results as JSON")
+    return parser.parse_args(argv)
+
+
+def _environment() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("SECRET_KEY", "import-time-secret")
+    env.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+    for name, value in {
+        "SMTP_SERVER": "localhost",
+        "SMTP_PORT": "25",
+        "SMTP_USER": "",
+        "SMTP_PASSWORD": "",
+        "EMAIL_FROM": "import-time@example.com",
+    }.items():
+        env.setdefault(name, value)
+    return env
+
+
+def measure(module: str) -> Tuple[float, Set[str], List[Tuple[float, str]]]:
+    # A fresh interpreter per run: anything already in sys.modules would not be counted.
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        env=_environment(),
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{result.stderr}")
+
+    total_us = 0
+    loaded = set()
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match is None:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        loaded.add(name)
+        imports.append((int(self_us) / 1000, name))
+        if name == module and len(indent) == 1:
+            total_us = int(cumulative_us)
+    imports.sort(reverse=True)
+    return total_us / 1000, loaded, imports
+
+
+def _budgets(overrides: List[str]) -> Dict[str, float]:
+    budgets = dict(BUDGETS_MS)
+    for override in overrides:
+        module, _, value = override.partition("=")
+        try:
+            budgets[module] = float(value)
+        except ValueError:
+            raise SystemExit(f"Invalid budget {override!r}; expected MODULE=MS")
+    return budgets
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    budgets = _budgets(args.budget)
+
+    failures = []
+    report = {}
+    for module in args.modules:
+        runs = [measure(module) for _ in range(max(1, args.runs))]
+        elapsed_ms, loaded, imports = min(runs, key=lambda run: run[0])
+        budget = budgets.get(module)
+        deferred = [name for name in DEFERRED_MODULES if name in loaded]
+        report[module] = {"import_ms": round(elapsed_ms, 1), "budget_ms": budget, "deferred_loaded": deferred}
+
+        verdict = "ok"
+        if budget is not None and elapsed_ms > budget:
+            verdict = "OVER BUDGET"
+            failures.append(f"{module}: {elapsed_ms:.1f} ms (budget {budget:.0f} ms)")
+        if deferred:
+            verdict = "EAGER IMPORT"
+            failures.append(f"{module}: loads {', '.join(deferred)} at import")
+        budget_text = f"{budget:.0f} ms" if budget is not None else "-"
+        print(f"{module:<20} {elapsed_ms:>8.1f} ms  budget {budget_text:>8}  {verdict}")
+        for self_ms, name in imports[: args.top]:
+            print(f"    {self_ms:>8.1f} ms  {name}")
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
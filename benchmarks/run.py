@@ -0,0 +1,381 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+SCENARIOS = ("login", "list_projects", "get_project", "project_stats", "list_project_tasks", "task_crud", "mixed")
+MIXED_WEIGHTS = {"list_projects": 30, "get_project": 30, "list_project_tasks": 20, "project_stats": 5, "task_crud": 15}
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.run",
+        description="Seed a local database, drive main:app in-process and report latency and SQL per request.",
+    )
+    parser.add_argument("--database-url", help="defaults to a fresh SQLite file in a temporary directory")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--projects", type=int, default=200)
+    parser.add_argument("--tasks-per-project", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=400, help="operations per scenario")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma-separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", type=Path, help="write results as JSON")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="overwrite the baseline with this run")
+    parser.add_argument("--compare", action="store_true", help="exit non-zero when a scenario regressed against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative p95/throughput drift")
+    return parser.parse_args(argv)
+
+
+def configure_environment(args: argparse.Namespace) -> None:
+    # Settings are read when the app is first built, so this has to run first.
+    database_url = args.database_url or f"sqlite+aiosqlite:///{tempfile.mkdtemp(prefix='bench-')}/bench.db"
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.pop("DATABASE_READ_URL", None)
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    for name, value in {
+        "SMTP_SERVER": "localhost",
+        "SMTP_PORT": "25",
+        "SMTP_USER": "",
+        "SMTP_PASSWORD": "",
+        "EMAIL_FROM": "bench@example.com",
+    }.items():
+        os.environ.setdefault(name, value)
+    os.environ["EMAIL_DISPATCHER_ENABLED"] = "false"
+    os.environ["METRICS_ENABLED"] = "true"
+    os.environ["METRICS_SERVER_TIMING"] = "true"
+    os.environ["DB_POOL_WARMUP"] = "0"
+    # Every simulated client shares one IP and a handful of accounts; the login limits
+    # would reject most of the login scenario.
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    sys.path.insert(0, str(ROOT))
+
+
+async def seed(args: argparse.Namespace) -> Dict[str, List[int]]:
+    from sqlalchemy import insert
+
+    from app.db import get_engine
+    from app.hashing import get_pwd_context
+    from app.migrations import upgrade
+    from app.models import Project, ProjectMember, ProjectPriority, ProjectProcessStatus, Task, User, UserStatus
+    from app.stats import rebuild_task_counts
+
+    await upgrade()
+    rng = random.Random(args.seed)
+    hashed_password = get_pwd_context().hash("bench-password")
+    users = [
+        {
+            "id": uuid.UUID(int=rng.getrandbits(128)),
+            "email": f"user{index}@bench.example.com",
+            "hashed_password": hashed_password,
+            "user_status": UserStatus.SIMPLE_USER,
+            "is_active": True,
+            "is_superuser": False,
+            "is_verified": True,
+        }
+        for index in range(args.users)
+    ]
+    projects = [
+        {
+            "project_id": index + 1,
+            "project_name": f"project-{index}",
+            "project_status": rng.choice(list(ProjectProcessStatus)),
+            "project_priority": rng.choice(list(ProjectPriority)),
+            "owner_id": rng.choice(users)["id"],
+        }
+        for index in range(args.projects)
+    ]
+    tasks = [
+        {
+            "task_name": f"task-{project['project_id']}-{index}",
+            "project_id": project["project_id"],
+            "assignee_id": rng.choice(users)["id"],
+        }
+        for project in projects
+        for index in range(args.tasks_per_project)
+    ]
+    # Simple users only see the projects they own or have tasks in.
+    members = {(project["project_id"], project["owner_id"]) for project in projects}
+    members.update((task["project_id"], task["assignee_id"]) for task in tasks)
+
+    async with get_engine().begin() as conn:
+        await conn.execute(insert(User), users)
+        await conn.execute(insert(Project), projects)
+        for start in range(0, len(tasks), 5000):
+            await conn.execute(insert(Task), tasks[start:start + 5000])
+        await conn.execute(
+            insert(ProjectMember), [{"project_id": project_id, "user_id": user_id} for project_id, user_id in members]
+        )
+        await conn.run_sync(rebuild_task_counts)
+    emails = {user["id"]: user["email"] for user in users}
+    memberships: Dict[str, List[int]] = {email: [] for email in emails.values()}
+    for project_id, user_id in sorted(members):
+        memberships[emails[user_id]].append(project_id)
+    return memberships
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.queries: List[int] = []
+        self.errors = 0
+
+    async def request(self, client, method: str, url: str, expected=(200,), **kwargs):
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.latencies.append(time.perf_counter() - started)
+        match = SERVER_TIMING_QUERIES.search(response.headers.get("server-timing", ""))
+        if match:
+            self.queries.append(int(match.group(1)))
+        if response.status_code not in expected:
+            self.errors += 1
+        return response
+
+
+class Workload:
+    def __init__(self, client, memberships: Dict[str, List[int]], tokens: Dict[str, str], args: argparse.Namespace):
+        self.client = client
+        # Users without a project are only used for the scenarios that need none.
+        self.memberships = memberships
+        self.emails = [email for email, project_ids in memberships.items() if project_ids]
+        self.tokens = tokens
+        self.args = args
+        self.rng = random.Random(args.seed)
+
+    def _auth(self):
+        email = self.rng.choice(self.emails)
+        return email, {"Authorization": f"Bearer {self.tokens[email]}"}
+
+    def _project_id(self, email: str) -> int:
+        return self.rng.choice(self.memberships[email])
+
+    async def login(self, recorder: Recorder):
+        email = self.rng.choice(self.emails)
+        await recorder.request(
+            self.client, "POST", "/api/v1/auth/jwt/login", data={"username": email, "password": "bench-password"}
+        )
+
+    async def list_projects(self, recorder: Recorder):
+        _, headers = self._auth()
+        await recorder.request(self.client, "GET", "/api/v1/projects?limit=50", headers=headers)
+
+    async def get_project(self, recorder: Recorder):
+        email, headers = self._auth()
+        await recorder.request(
+            self.client, "GET", f"/api/v1/projects/{self._project_id(email)}?include=tasks", headers=headers
+        )
+
+    async def project_stats(self, recorder: Recorder):
+        _, headers = self._auth()
+        await recorder.request(self.client, "GET", "/api/v1/projects/stats", headers=headers)
+
+    async def list_project_tasks(self, recorder: Recorder):
+        email, headers = self._auth()
+        await recorder.request(
+            self.client, "GET", f"/api/v1/projects/{self._project_id(email)}/tasks?limit=50", headers=headers
+        )
+
+    async def task_crud(self, recorder: Recorder):
+        email, headers = self._auth()
+        name = f"bench-{uuid.uuid4().hex}"
+        created = await recorder.request(
+            self.client,
+            "POST",
+            "/api/v1/",
+            json={"task_name": name, "project_id": self._project_id(email), "assignee_id": str(uuid.UUID(int=0))},
+            headers=headers,
+        )
+        if created.status_code != 200:
+            return
+        task_id = created.json()["task_id"]
+        await recorder.request(self.client, "GET", f"/api/v1/{task_id}", headers=headers)
+        await recorder.request(self.client, "PUT", f"/api/v1/{task_id}", json={"task_name": name + "-x"}, headers=headers)
+        await recorder.request(self.client, "DELETE", f"/api/v1/{task_id}", headers=headers)
+
+    async def mixed(self, recorder: Recorder):
+        names, weights = zip(*MIXED_WEIGHTS.items())
+        await getattr(self, self.rng.choices(names, weights)[0])(recorder)
+
+
+async def run_scenario(operation: Callable[[Recorder], Awaitable[None]], args: argparse.Namespace) -> Dict[str, float]:
+    recorder = Recorder()
+    remaining = args.requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await operation(recorder)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(recorder.latencies)
+    return {
+        "requests": len(latencies),
+        "errors": recorder.errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "queries_per_request": round(sum(recorder.queries) / len(recorder.queries), 2) if recorder.queries else 0.0,
+    }
+
+
+async def _walk_pages(client, url: str, headers: Dict[str, str], id_key: str, limit: int) -> List[int]:
+    ids: List[int] = []
+    cursor = None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = await client.get(url, params=params, headers=headers)
+        response.raise_for_status()
+        ids += [item[id_key] for item in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return ids
+
+
+async def check_pagination(client, memberships: Dict[str, List[int]], tokens: Dict[str, str]) -> None:
+    # Seeding inserts every row in one statement, so they share created_at: walking the
+    # listings in small pages checks that keyset cursors split ties instead of skipping them.
+    email = max(memberships, key=lambda email: len(memberships[email]))
+    headers = {"Authorization": f"Bearer {tokens[email]}"}
+    projects = await _walk_pages(client, "/api/v1/projects", headers, "project_id", 3)
+    if projects != memberships[email]:
+        raise SystemExit(f"Paging /projects returned {projects}, expected {memberships[email]}")
+
+    from sqlalchemy import select
+
+    from app.db import async_session_maker
+    from app.models import Task, User
+
+    async with async_session_maker() as session:
+        assigned = await session.scalars(
+            select(Task.task_id).join(User, User.id == Task.assignee_id).where(User.email == email)
+        )
+        expected = sorted(assigned.all())
+    tasks = await _walk_pages(client, "/api/v1/users/me/tasks", headers, "task_id", 3)
+    if sorted(tasks) != expected or len(set(tasks)) != len(tasks):
+        raise SystemExit(f"Paging /users/me/tasks returned {tasks}, expected {expected}")
+
+
+async def benchmark(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    import httpx
+
+    from main import create_app
+
+    app = create_app()
+    memberships = await seed(args)
+    results = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            tokens = {}
+            for email in memberships:
+                response = await client.post(
+                    "/api/v1/auth/jwt/login", data={"username": email, "password": "bench-password"}
+                )
+                response.raise_for_status()
+                tokens[email] = response.json()["access_token"]
+
+            await check_pagination(client, memberships, tokens)
+            workload = Workload(client, memberships, tokens, args)
+            for name in args.scenarios.split(","):
+                name = name.strip()
+                if name not in SCENARIOS:
+                    raise SystemExit(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+                results[name] = await run_scenario(getattr(workload, name), args)
+                print_row(name, results[name])
+    return results
+
+
+def print_row(name: str, result: Dict[str, float]) -> None:
+    print(
+        f"{name:<20} {result['requests']:>6} req {result['errors']:>4} err {result['throughput_rps']:>8} req/s "
+        f"p50 {result['p50_ms']:>8} ms  p95 {result['p95_ms']:>8} ms  p99 {result['p99_ms']:>8} ms  "
+        f"{result['queries_per_request']:>6} q/req"
+    )
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        if result["errors"] > reference.get("errors", 0):
+            regressions.append(f"{name}: {result['errors']} errors (baseline {reference.get('errors', 0)})")
+        if result["p95_ms"] > reference["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {result['p95_ms']} ms (baseline {reference['p95_ms']} ms)")
+        if result["throughput_rps"] < reference["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {result['throughput_rps']} req/s (baseline {reference['throughput_rps']} req/s)"
+            )
+        # Query counts are deterministic, so any increase is a regression.
+        if result["queries_per_request"] > reference["queries_per_request"] + 0.05:
+            regressions.append(
+                f"{name}: {result['queries_per_request']} queries/request "
+                f"(baseline {reference['queries_per_request']})"
+            )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    configure_environment(args)
+    results = asyncio.run(benchmark(args))
+
+    report = {
+        "config": {
+            "users": args.users,
+            "projects": args.projects,
+            "tasks_per_project": args.tasks_per_project,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "database": os.environ["DATABASE_URL"].split("://", 1)[0],
+        },
+        "results": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Baseline written to {args.baseline}")
+
+    if args.compare:
+        if not args.baseline.exists():
+            print(f"No baseline at {args.baseline}; run with --save-baseline first.")
+            return 1
+        baseline = json.loads(args.baseline.read_text())
+        if baseline.get("config") != report["config"]:
+            print("Warning: baseline was recorded with a different configuration.")
+        regressions = compare(results, baseline["results"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
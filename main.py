@@ -1,50 +1,138 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-
-from app.db import get_db_and_tables
-from app.routers import auth, projects, tasks  
+import logging
 from contextlib import asynccontextmanager
+from typing import Optional
 
+from fastapi import FastAPI
 
-
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    await get_db_and_tables()
-    yield
-
-
-app = FastAPI(lifespan=lifespan, title="Task Manager API", version="1.0.0")
-
+from app.config import Settings, configure, get_settings
 
 origins = [
     "http://localhost",
-    "http://localhost:3000", 
+    "http://localhost:3000",
 ]
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-@app.on_event("startup")
-async def on_startup():
-    await get_db_and_tables()
-
-
-app.include_router(auth.router, prefix="/api/v1")
-app.include_router(projects.router, prefix="/api/v1")
-app.include_router(tasks.router, prefix="/api/v1")
-
 
-@app.get("/")
-def read_root():
-    return {"message": "Welcome to the Task Manager API!"}
+# The application modules are imported here rather than at the top of the file, so
+# importing main (for a CLI, a test collector or a uvicorn supervisor) pays for none
+# of them. Passing settings replaces the process-wide ones: the settings-bound
+# singletons (keys, caches, limiters, workers) are rebuilt on next use and the engines
+# after the previous app's lifespan has disposed of them. Run one app at a time.
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    if settings is not None:
+        configure(settings)
+    settings = get_settings()
+
+    from fastapi.middleware.cors import CORSMiddleware
+
+    from app.archive import archiver
+    from app.auth import jwt_strategy, user_cache
+    from app.db import dispose_engines, get_engine, pool_stats
+    from app.events import event_bus
+    from app.hashing import password_hasher
+    from app.idempotency import idempotency_store
+    from app.mailer import email_dispatcher
+    from app.metrics import MetricsMiddleware, metrics
+    from app.migrations import check_schema_version, warm_up_pool
+    from app.ratelimit import AdmissionControlMiddleware, admission_controller, rate_limiter
+    from app.response_cache import response_cache
+    from app.routers import admin, auth, events, health, metrics as metrics_router, projects, search, tasks
+
+    logging.getLogger("app").setLevel(settings.log_level.upper())
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        app.state.ready = False
+        if settings.schema_check_on_startup:
+            await check_schema_version()
+        if settings.db_pool_warmup > 0:
+            await warm_up_pool(min(settings.db_pool_warmup, settings.db_pool_size))
+        if settings.email_dispatcher_enabled:
+            email_dispatcher.start()
+        if settings.archive_enabled:
+            archiver.start()
+        idempotency_store.start()
+        await event_bus.start()
+        app.state.ready = True
+        yield
+        app.state.ready = False
+        await event_bus.stop()
+        await idempotency_store.stop()
+        await archiver.stop()
+        await email_dispatcher.stop()
+        password_hasher.shutdown()
+        await dispose_engines()
+
+    app = FastAPI(lifespan=lifespan, title="Task Manager API", version="1.0.0")
+
+    # Long-lived feeds and probes must not hold or wait for admission slots.
+    app.add_middleware(
+        AdmissionControlMiddleware,
+        controller=admission_controller,
+        exempt_prefixes=("/health", "/metrics", "/api/v1/events"),
+    )
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    app.include_router(auth.router, prefix="/api/v1")
+    app.include_router(projects.router, prefix="/api/v1")
+    # Before tasks: its catch-all GET /api/v1/{task_id} would otherwise shadow /search.
+    app.include_router(search.router, prefix="/api/v1")
+    app.include_router(tasks.router, prefix="/api/v1")
+    app.include_router(events.router, prefix="/api/v1")
+    app.include_router(admin.router, prefix="/api/v1")
+    app.include_router(health.router)
+
+    if settings.metrics_enabled:
+        metrics.register_collector("db_pool", lambda: pool_stats(get_engine()))
+        metrics.register_collector("user_cache", user_cache.stats)
+        metrics.register_collector("jwt_claims_cache", jwt_strategy.stats)
+        metrics.register_collector("response_cache", response_cache.backend.stats)
+        metrics.register_collector("password_hasher", password_hasher.stats)
+        metrics.register_collector("event_bus", event_bus.stats)
+        metrics.register_collector("admission", admission_controller.stats)
+        metrics.register_collector("archiver", archiver.stats)
+        metrics.register_collector("idempotency", idempotency_store.stats)
+        metrics.register_collector("rate_limit_rejected", rate_limiter.stats)
+        metrics.register_collector(
+            "email_dispatcher", lambda: {"sent": email_dispatcher.sent, "failed": email_dispatcher.failed}
+        )
+        app.add_middleware(
+            MetricsMiddleware,
+            query_threshold=settings.metrics_query_threshold,
+            server_timing=settings.metrics_server_timing,
+        )
+        # Open only outside production; there it needs METRICS_TOKEN.
+        if settings.metrics_token is not None or settings.environment != "production":
+            app.include_router(metrics_router.router)
+
+    @app.get("/")
+    def read_root():
+        return {"message": "Welcome to the Task Manager API!"}
+
+    return app
+
+
+_app: Optional[FastAPI] = None
+
+
+def __getattr__(name: str):
+    # `main:app` keeps working for uvicorn and existing imports; the app is built the
+    # first time it is asked for.
+    global _app
+    if name == "app":
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run("main:app", host="localhost", port=8000, log_level="info")
+    from app.serve import main
 
+    main()